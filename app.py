@@ -2,13 +2,13 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
 import boto3
 import json
 import os
 from langchain_aws import ChatBedrock
-from utils import calculate_sip, calculate_break_even, calculate_swp, create_investment_growth_report, create_swp_report, convert_df_to_excel, initialize_qa_bot, get_answer 
+from utils import calculate_sip_schedule, calculate_step_up_sip_schedule, calculate_swp_schedule, calculate_tax_lot_swp_schedule, solve_sip_contribution, solve_sip_rate, solve_sip_months, solve_swp_withdrawal, solve_swp_months, simulate_lifecycle, compare_retirement_ages, simulate_scenarios, summarize_scenarios, load_nav_series, backtest_sip, summarize_backtest, calculate_xirr, sip_cash_flows, swp_cash_flows, create_investment_growth_report, create_swp_report, convert_df_to_excel, convert_sip_schedule_to_excel, report_bundle_key, submit_report_bundle, QAWarmup, get_answer 
 import datetime
-from io import BytesIO
 # Set page configuration
 st.set_page_config(
     page_title="Investment Calculator",
@@ -18,17 +18,87 @@ st.set_page_config(
 
 @st.cache_resource
 def load_qa_system():
-    return initialize_qa_bot()
+    # One warm-up per server process, shared by every session
+    return QAWarmup().start()
+
+@st.cache_resource
+def load_cached_nav_series(path, modified_time):
+    # The modification time is part of the cache key so an updated file is reloaded
+    return load_nav_series(path)
+
+# One callback keeps a text box, its slider and the canonical session value in step, so an edit
+# to either widget settles in a single rerun instead of the two widgets updating each other
+def sync_input(key, text_key, slider_key, cast, min_value, max_value, text_format, lower_bound, from_slider):
+    if from_slider:
+        value = st.session_state[slider_key]
+    else:
+        try:
+            # Typed values below what the field can use are raised to its lower bound
+            value = max(cast(st.session_state[text_key]), lower_bound)
+        except ValueError:
+            # Put back the last valid value instead of keeping text that can't be used
+            st.session_state[text_key] = text_format(st.session_state[key])
+            return
+    st.session_state[key] = value
+    st.session_state[text_key] = text_format(value)
+    # Typed values may lie outside the slider's range; the slider just shows the nearest end
+    st.session_state[slider_key] = min(max(value, min_value), max_value)
+
+def synced_input(label, key, text_key, slider_key, min_value, max_value, step=None, cast=float, text_format=str, slider_label=None, lower_bound=0):
+    # The canonical value under key must already be set; the widgets are seeded from it
+    if text_key not in st.session_state:
+        st.session_state[text_key] = text_format(st.session_state[key])
+    if slider_key not in st.session_state:
+        st.session_state[slider_key] = min(max(cast(st.session_state[key]), min_value), max_value)
+    args = (key, text_key, slider_key, cast, min_value, max_value, text_format, lower_bound)
+    st.text_input(label, key=text_key, on_change=sync_input, args=args + (False,))
+    st.slider(slider_label or label, min_value, max_value, step=step, key=slider_key,
+              on_change=sync_input, args=args + (True,))
+
+# Button to build a zip of the workbook, Parquet and CSV files for the schedules on the background
+# worker, then its progress and download. Only the status fragment polls while the bundle is built.
+def report_bundle_panel(key, schedules, summary, file_name):
+    job = st.session_state.get(key)
+    if st.button("Prepare Report Bundle (Excel, Parquet, CSV)", key=f"{key}_button"):
+        job = st.session_state[key] = submit_report_bundle(schedules, summary)
+    # A bundle prepared for earlier inputs is not offered
+    if job is None or job.key != report_bundle_key(schedules, summary):
+        return
+    polling = not job.ready
+
+    @st.fragment(run_every=1 if polling else None)
+    def report_bundle_status():
+        if job.ready and polling:
+            # Rerun once more so the download is drawn without the polling timer
+            st.rerun()
+        if not job.ready:
+            st.progress(job.progress, text=job.status)
+        elif job.data is None:
+            st.error(f"The report bundle could not be built: {job.status}")
+        else:
+            st.download_button(
+                label="Download Report Bundle",
+                data=job.data,
+                file_name=file_name,
+                mime="application/zip",
+                key=f"{key}_download",
+                on_click="ignore"
+            )
+
+    report_bundle_status()
 
 # Import external CSS
 with open("styles.css") as f:
     st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
+# Start loading the chatbot's models in the background right away; the calculators never wait for it
+qa_warmup = load_qa_system()
+
 # Streamlit app
 st.title("💰 Investment Calculator")
 
 # Sidebar navigation
-option = st.sidebar.selectbox("Select Calculator", ["SIP Calculator", "SWP Calculator", "Chatbot"], key="selected_option")
+option = st.sidebar.selectbox("Select Calculator", ["SIP Calculator", "SWP Calculator", "Goal Planner", "Retirement Planner", "Historical Backtest", "Scenario Comparison", "Chatbot"], key="selected_option")
 
 if option == "SIP Calculator":
     st.header("📈 SIP Calculator")
@@ -38,17 +108,11 @@ if option == "SIP Calculator":
     DEFAULT_ANNUAL_RETURN_RATE = 12.0
     DEFAULT_INVESTMENT_YEARS = 10
 
-    # Initialize all session state variables at once
+    # Initialize the canonical values; synced_input seeds its widgets from them
     defaults = {
         'monthly_contribution': DEFAULT_MONTHLY_CONTRIBUTION,
         'annual_return_rate': DEFAULT_ANNUAL_RETURN_RATE,
-        'investment_years': DEFAULT_INVESTMENT_YEARS,
-        'sip_monthly_contribution': str(DEFAULT_MONTHLY_CONTRIBUTION),
-        'sip_annual_return_rate': str(DEFAULT_ANNUAL_RETURN_RATE),
-        'sip_investment_years': str(DEFAULT_INVESTMENT_YEARS),
-        'sip_monthly_contribution_slider': DEFAULT_MONTHLY_CONTRIBUTION,
-        'sip_annual_return_rate_slider': DEFAULT_ANNUAL_RETURN_RATE,
-        'sip_investment_years_slider': DEFAULT_INVESTMENT_YEARS
+        'investment_years': DEFAULT_INVESTMENT_YEARS
     }
 
     # Initialize any missing session state variables
@@ -56,518 +120,740 @@ if option == "SIP Calculator":
         if key not in st.session_state:
             st.session_state[key] = value
 
-    # Create callback functions for syncing inputs
-    def update_contribution():
-        try:
-            value = float(st.session_state.sip_monthly_contribution)
-            st.session_state.monthly_contribution = value
-            st.session_state.sip_monthly_contribution_slider = value
-        except ValueError:
-            pass
-
-    def update_contribution_slider():
-        st.session_state.monthly_contribution = st.session_state.sip_monthly_contribution_slider
-        st.session_state.sip_monthly_contribution = str(st.session_state.sip_monthly_contribution_slider)
-
-    def update_return_rate():
-        try:
-            value = float(st.session_state.sip_annual_return_rate)
-            st.session_state.annual_return_rate = value
-            st.session_state.sip_annual_return_rate_slider = value
-        except ValueError:
-            pass
-
-    def update_return_rate_slider():
-        st.session_state.annual_return_rate = st.session_state.sip_annual_return_rate_slider
-        st.session_state.sip_annual_return_rate = str(st.session_state.sip_annual_return_rate_slider)
-
-    def update_years():
-        try:
-            value = int(st.session_state.sip_investment_years)
-            st.session_state.investment_years = value
-            st.session_state.sip_investment_years_slider = value
-        except ValueError:
-            pass
-
-    def update_years_slider():
-        st.session_state.investment_years = st.session_state.sip_investment_years_slider
-        st.session_state.sip_investment_years = str(st.session_state.sip_investment_years_slider)
-
-    # Create columns for inputs
-    col1, col2, col3 = st.columns(3)
+    def parse_paused_months(text):
+        paused = []
+        for part in text.replace(';', ',').split(','):
+            part = part.strip()
+            try:
+                if '-' in part:
+                    first, last = (int(value) for value in part.split('-', 1))
+                    paused.extend(range(first, last + 1))
+                elif part:
+                    paused.append(int(part))
+            except ValueError:
+                st.warning(f"Ignoring invalid paused month: {part}")
+        return paused
+
+    def parse_top_ups(text):
+        top_ups = {}
+        for part in text.split(';'):
+            if not part.strip():
+                continue
+            try:
+                month, amount = part.split(':', 1)
+                top_ups[int(month)] = top_ups.get(int(month), 0.0) + float(amount.replace(',', ''))
+            except ValueError:
+                st.warning(f"Ignoring invalid top-up: {part.strip()}")
+        return top_ups
+
+    # Changing an input reruns only this fragment and the results nested in it, not the whole app
+    @st.fragment
+    def sip_inputs():
+        # Create columns for inputs
+        col1, col2, col3 = st.columns(3)
 
-    # Monthly Contribution
-    with col1:
-        st.text_input(
-            "Monthly Contribution Amount (₹)",
-            key="sip_monthly_contribution",
-            on_change=update_contribution
-        )
-        st.slider(
-            "Select Monthly Contribution Amount (₹)",
-            100.0, 1000000.0,
-            key="sip_monthly_contribution_slider",
-            on_change=update_contribution_slider
-        )
+        # Monthly Contribution
+        with col1:
+            synced_input("Monthly Contribution Amount (₹)", 'monthly_contribution',
+                         'sip_monthly_contribution', 'sip_monthly_contribution_slider',
+                         100.0, 1000000.0, slider_label="Select Monthly Contribution Amount (₹)")
 
-    # Expected Annual Return Rate
-    with col2:
-        st.text_input(
-            "Expected Annual Return Rate (%)",
-            key="sip_annual_return_rate",
-            on_change=update_return_rate
-        )
-        st.slider(
-            "Select Expected Annual Return Rate (%)",
-            0.0, 50.0,
-            key="sip_annual_return_rate_slider",
-            on_change=update_return_rate_slider
-        )
+        # Expected Annual Return Rate
+        with col2:
+            synced_input("Expected Annual Return Rate (%)", 'annual_return_rate',
+                         'sip_annual_return_rate', 'sip_annual_return_rate_slider',
+                         0.0, 50.0, slider_label="Select Expected Annual Return Rate (%)")
 
-    # Investment Duration
-    with col3:
-        st.text_input(
-            "Investment Duration (Years)",
-            key="sip_investment_years",
-            on_change=update_years
-        )
-        st.slider(
-            "Select Investment Duration (Years)",
-            0, 50,
-            key="sip_investment_years_slider",
-            on_change=update_years_slider
+        # Investment Duration
+        with col3:
+            synced_input("Investment Duration (Years)", 'investment_years',
+                         'sip_investment_years', 'sip_investment_years_slider',
+                         0, 50, cast=int, slider_label="Select Investment Duration (Years)")
+
+        # Step-up, pauses and top-ups
+        with st.expander("Step-up, Pauses and Top-ups"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                step_up_type = st.radio("Annual Step-up", ["None", "Percentage", "Fixed Amount"], key="sip_step_up_type", horizontal=True)
+                if step_up_type == "Percentage":
+                    step_up_value = st.number_input("Yearly Increase (%)", 0.0, 100.0, 10.0, key="sip_step_up_rate")
+                elif step_up_type == "Fixed Amount":
+                    step_up_value = st.number_input("Yearly Increase (₹)", 0.0, 1000000.0, 1000.0, step=100.0, key="sip_step_up_amount")
+                else:
+                    step_up_value = 0.0
+            with col2:
+                inflation_rate = st.number_input("Expected Inflation Rate (%)", 0.0, 30.0, 0.0, key="sip_inflation_rate")
+                paused_text = st.text_input("Paused Months (e.g. 25-30, 48)", key="sip_paused_months")
+            with col3:
+                top_ups_text = st.text_input("Lump-sum Top-ups (month:amount, e.g. 12:50000; 60:100000)", key="sip_top_ups")
+
+        sip_results(
+            step_up_rate=step_up_value / 100 if step_up_type == "Percentage" else 0.0,
+            step_up_amount=step_up_value if step_up_type == "Fixed Amount" else 0.0,
+            paused_months=parse_paused_months(paused_text),
+            top_ups=parse_top_ups(top_ups_text),
+            inflation_rate=inflation_rate
         )
 
-    # Auto-calculate on any input change
-    months = st.session_state.investment_years * 12
-    sip_results = calculate_sip(
-        st.session_state.monthly_contribution,
-        st.session_state.annual_return_rate / 100,
-        st.session_state.investment_years
-    )
-    future_value = sip_results[0]
-    total_invested = sip_results[1]
-
-    # Store future value in session state for SWP calculator
-    st.session_state['sip_future_value'] = future_value
-
-    # Rest of your code remains the same...
-    # Display results
-    st.metric("Future Value of Investment", f"₹{future_value:,.2f}")
-    st.metric("Total Amount Invested", f"₹{total_invested:,.2f}")
-    st.metric("Estimated Returns", f"₹{future_value - total_invested:,.2f}")
-
-    # Create a pie chart to display the distribution
-    pie_data = {
-        'Category': ['Total Invested', 'Expected Returns'],
-        'Amount': [total_invested, future_value - total_invested]
-    }
-    pie_chart = px.pie(pie_data, values='Amount', names='Category', title='Investment Breakdown')
-    st.plotly_chart(pie_chart)
-
-    # Display monthly SIP contribution details
-    st.subheader("Monthly SIP Contribution Details")
-    
-    # Calculate monthly progression with improved breakeven detection
-    monthly_rate = (1 + st.session_state.annual_return_rate / 100) ** (1/12) - 1
-    monthly_data = []
-    cumulative_investment = 0
-    cumulative_value = 0
-    breakeven_month = None
-    has_broken_even = False  # Flag to track if investment has broken even
-    
-    for month in range(1, months + 1):
-        cumulative_investment += st.session_state.monthly_contribution
-        # Calculate compounded returns
-        cumulative_value = sum([
-            st.session_state.monthly_contribution * (1 + monthly_rate) ** (month - i)
-            for i in range(month)
-        ])
-        
-        returns = cumulative_value - cumulative_investment
-        
-        # Track breakeven point (when returns first become positive)
-        if not has_broken_even and returns > 0:
-            breakeven_month = month
-            has_broken_even = True
-            
-        monthly_data.append({
-            'Month': month,
-            'Year': (month - 1) // 12 + 1,
-            'Invested Amount': cumulative_investment,
-            'Current Value': cumulative_value,
-            'Returns': returns,
-            'Returns %': (returns / cumulative_investment) * 100 if cumulative_investment > 0 else 0
-        })
-    
-    # Create DataFrame with monthly details
-    sip_data = pd.DataFrame(monthly_data)
+    @st.fragment
+    def sip_results(step_up_rate, step_up_amount, paused_months, top_ups, inflation_rate):
+        step_up_active = bool(step_up_rate or step_up_amount or inflation_rate or paused_months or top_ups)
+
+        # Auto-calculate on any input change
+        months = st.session_state.investment_years * 12
+        # Annual rate compounded monthly, the convention of calculate_sip and the planners
+        monthly_rate = st.session_state.annual_return_rate / 100 / 12
+        if step_up_active:
+            sip_schedule = calculate_step_up_sip_schedule(
+                st.session_state.monthly_contribution,
+                monthly_rate,
+                months,
+                step_up_rate=step_up_rate,
+                step_up_amount=step_up_amount,
+                paused_months=paused_months,
+                top_ups=top_ups,
+                annual_inflation_rate=inflation_rate / 100
+            )
+        else:
+            # Reuse this session's previous schedule when only the horizon or the contribution changed
+            sip_schedule = calculate_sip_schedule(
+                st.session_state.monthly_contribution,
+                monthly_rate,
+                months,
+                previous=st.session_state.get('sip_schedule')
+            )
+        st.session_state['sip_schedule'] = sip_schedule
+        # The headline figures are the schedule's last month, so they match the table and exports
+        future_value = sip_schedule['value'][-1] if months else 0.0
+        total_invested = sip_schedule['invested'][-1] if months else 0.0
+
+        # Store future value in session state for SWP calculator
+        st.session_state['sip_future_value'] = future_value
+
+        # Rest of your code remains the same...
+        # Display results
+        st.metric("Future Value of Investment", f"₹{future_value:,.2f}")
+        st.metric("Total Amount Invested", f"₹{total_invested:,.2f}")
+        st.metric("Estimated Returns", f"₹{future_value - total_invested:,.2f}")
+        if step_up_active and inflation_rate and months:
+            st.metric("Future Value in Today's Money", f"₹{sip_schedule['real_value'][-1]:,.2f}")
+        if months:
+            # Annualized return of the dated contributions, starting this month
+            sip_xirr = calculate_xirr(*sip_cash_flows(sip_schedule, datetime.date.today()))
+            st.metric("XIRR (Annualized Return)", f"{sip_xirr * 100:,.2f}%")
+
+        # Create a pie chart to display the distribution
+        pie_data = {
+            'Category': ['Total Invested', 'Expected Returns'],
+            'Amount': [total_invested, future_value - total_invested]
+        }
+        pie_chart = px.pie(pie_data, values='Amount', names='Category', title='Investment Breakdown')
+        st.plotly_chart(pie_chart)
+
+        # Display monthly SIP contribution details
+        st.subheader("Monthly SIP Contribution Details")
     
-    # Display breakeven information only if it exists
-    if breakeven_month:
-        breakeven_year = (breakeven_month - 1) // 12 + 1
-        breakeven_month_in_year = (breakeven_month - 1) % 12 + 1
+        breakeven_month = sip_schedule.meta['breakeven_month']
+        has_broken_even = breakeven_month is not None
+        sip_data = sip_schedule.to_frame()
+
+        # Display breakeven information only if it exists
+        if breakeven_month:
+            breakeven_year = (breakeven_month - 1) // 12 + 1
+            breakeven_month_in_year = (breakeven_month - 1) % 12 + 1
         
-        # Create an info box for initial breakeven point
-        st.info(f"""
-        🎯 Initial Breakeven Point:
-        - Investment broke even in Month {breakeven_month} (Year {breakeven_year}, Month {breakeven_month_in_year})
-        - Investment at breakeven: ₹{sip_data['Invested Amount'].iloc[breakeven_month-1]:,.2f}
-        - Value at breakeven: ₹{sip_data['Current Value'].iloc[breakeven_month-1]:,.2f}
-        - Returns at breakeven: ₹{sip_data['Returns'].iloc[breakeven_month-1]:,.2f}
-        """)
-
-    # Fixed styling function
-    def highlight_years_and_breakeven(df):
-        def style_row(row):
-            if breakeven_month and row.name == breakeven_month - 1:
-                return ['background-color: #FFD700; font-weight: bold'] * len(row)
-            elif (row['Month'] % 12) == 1:
-                return ['background-color: #90EE90'] * len(row)
-            return [''] * len(row)
-        
-        return pd.DataFrame(df.apply(style_row, axis=1).tolist(), 
-                          index=df.index, 
-                          columns=df.columns)
-
-    # Format and style the DataFrame
-    styled_sip_data = sip_data.style\
-        .format({
-            'Invested Amount': '₹{:,.2f}',
-            'Current Value': '₹{:,.2f}',
-            'Returns': '₹{:,.2f}',
-            'Returns %': '{:,.2f}%'
-        })\
-        .apply(highlight_years_and_breakeven, axis=None)
-    
-    # Display the styled DataFrame
-    st.dataframe(
-        styled_sip_data,
-        height=400,
-        use_container_width=True
-    )
+            # Create an info box for initial breakeven point
+            st.info(f"""
+            🎯 Initial Breakeven Point:
+            - Investment broke even in Month {breakeven_month} (Year {breakeven_year}, Month {breakeven_month_in_year})
+            - Investment at breakeven: ₹{sip_data['Invested Amount'].iloc[breakeven_month-1]:,.2f}
+            - Value at breakeven: ₹{sip_data['Current Value'].iloc[breakeven_month-1]:,.2f}
+            - Returns at breakeven: ₹{sip_data['Returns'].iloc[breakeven_month-1]:,.2f}
+            """)
+
+        # Build the row styles from the month column in one pass
+        def highlight_years_and_breakeven(df):
+            row_styles = np.where(sip_schedule['month'] % 12 == 1, 'background-color: #90EE90', '').astype(object)
+            if breakeven_month:
+                row_styles[breakeven_month - 1] = 'background-color: #FFD700; font-weight: bold'
+            return pd.DataFrame(np.repeat(row_styles[:, None], df.shape[1], axis=1),
+                              index=df.index, 
+                              columns=df.columns)
 
-    # Add summary metrics in columns with improved breakeven display
-    col1, col2, col3 = st.columns(3)
+        # Format and style the DataFrame
+        styled_sip_data = sip_schedule.to_styler().apply(highlight_years_and_breakeven, axis=None)
     
-    with col1:
-        st.metric(
-            "Average Monthly Return", 
-            f"₹{(sip_data['Returns'].iloc[-1] / months):,.2f}"
+        # Display the styled DataFrame
+        st.dataframe(
+            styled_sip_data,
+            height=400,
+            use_container_width=True
         )
+
+        # Add summary metrics in columns with improved breakeven display
+        col1, col2, col3 = st.columns(3)
     
-    with col2:
-        st.metric(
-            "Current Monthly Return", 
-            f"₹{sip_data['Returns'].diff().iloc[-1]:,.2f}"
-        )
-        
-    with col3:
-        if has_broken_even:
-            current_returns = sip_data['Returns'].iloc[-1]
+        with col1:
             st.metric(
-                "Current Total Returns",
-                f"₹{current_returns:,.2f}",
-                delta=f"{(current_returns / sip_data['Invested Amount'].iloc[-1] * 100):.1f}%"
+                "Average Monthly Return", 
+                f"₹{(sip_data['Returns'].iloc[-1] / months):,.2f}"
             )
-        else:
-            months_to_breakeven = "Not yet reached"
+    
+        with col2:
             st.metric(
-                "Months to Breakeven",
-                months_to_breakeven
+                "Current Monthly Return", 
+                f"₹{sip_data['Returns'].diff().iloc[-1]:,.2f}"
             )
+        
+        with col3:
+            if has_broken_even:
+                current_returns = sip_data['Returns'].iloc[-1]
+                st.metric(
+                    "Current Total Returns",
+                    f"₹{current_returns:,.2f}",
+                    delta=f"{(current_returns / sip_data['Invested Amount'].iloc[-1] * 100):.1f}%"
+                )
+            else:
+                months_to_breakeven = "Not yet reached"
+                st.metric(
+                    "Months to Breakeven",
+                    months_to_breakeven
+                )
+
+        # Add download button
+        excel_data = convert_sip_schedule_to_excel(sip_schedule)
+        st.download_button(
+            label="Download Detailed SIP Analysis",
+            data=excel_data,
+            file_name="sip_detailed_analysis.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            on_click="ignore"
+        )
 
-    # Update Excel export function to handle breakeven correctly
-    def convert_df_to_excel(df):
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='SIP Details')
-            
-            workbook = writer.book
-            worksheet = writer.sheets['SIP Details']
-            
-            # Format definitions
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#F0F2F6',
-                'border': 1
-            })
-            
-            money_format = workbook.add_format({
-                'num_format': '₹#,##0.00',
-                'border': 1
-            })
-            
-            percent_format = workbook.add_format({
-                'num_format': '0.00"%"',
-                'border': 1
-            })
-            
-            year_format = workbook.add_format({
-                'bg_color': '#90EE90',
-                'border': 1
-            })
-            
-            breakeven_format = workbook.add_format({
-                'bg_color': '#FFD700',
-                'bold': True,
-                'border': 1
-            })
-            
-            # Apply formats
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-                
-            # Format data rows with correct breakeven handling
-            for row_num in range(1, len(df) + 1):
-                row_data = df.iloc[row_num-1]
-                
-                # Determine if this is a year change or breakeven row
-                is_year_change = row_data['Month'] % 12 == 1
-                is_breakeven = breakeven_month and row_num == breakeven_month
-                
-                # Choose appropriate format
-                if is_breakeven:
-                    row_format = breakeven_format
-                elif is_year_change:
-                    row_format = year_format
-                else:
-                    row_format = money_format
-                
-                # Write row data with appropriate formatting
-                for col_num, value in enumerate(row_data):
-                    if col_num in [2, 3, 4]:  # Money columns
-                        worksheet.write(row_num, col_num, value, row_format)
-                    elif col_num == 5:  # Percentage column
-                        worksheet.write(row_num, col_num, value/100, percent_format)
-                    else:
-                        worksheet.write(row_num, col_num, value, row_format)
-            
-            # Add breakeven information if applicable
-            summary_row = len(df) + 2
-            if breakeven_month:
-                worksheet.write(summary_row, 0, "Breakeven Analysis", workbook.add_format({'bold': True}))
-                worksheet.write(summary_row + 1, 0, f"Initial Breakeven Month: {breakeven_month}")
-                worksheet.write(summary_row + 1, 1, f"Year {(breakeven_month-1)//12 + 1}, Month {(breakeven_month-1)%12 + 1}")
-                worksheet.write(summary_row + 2, 0, "Returns at Breakeven")
-                worksheet.write(summary_row + 2, 1, df['Returns'].iloc[breakeven_month-1], money_format)
-            
-        return output.getvalue()
-
-    # Add download button
-    excel_data = convert_df_to_excel(sip_data)
-    st.download_button(
-        label="Download Detailed SIP Analysis",
-        data=excel_data,
-        file_name="sip_detailed_analysis.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+        sip_summary = {
+            'Monthly Contribution (₹)': float(st.session_state.monthly_contribution),
+            'Expected Annual Return (%)': float(st.session_state.annual_return_rate),
+            'Investment Duration (Years)': int(st.session_state.investment_years),
+            'Future Value (₹)': float(future_value),
+            'Total Invested (₹)': float(total_invested),
+            'Estimated Returns (₹)': float(future_value - total_invested),
+        }
+        if months:
+            sip_summary['XIRR (%)'] = float(sip_xirr * 100)
+        report_bundle_panel('sip_report_bundle', {'sip': sip_schedule}, sip_summary, "sip_report_bundle.zip")
+
+    sip_inputs()
 
 # SWP Calculator Section
 elif option == "SWP Calculator":
     st.header("📉 SWP Calculator")
+    # Initialize the canonical values; synced_input seeds its widgets from them
     if 'swp_initial_investment' not in st.session_state:
         st.session_state.swp_initial_investment = st.session_state.get('sip_future_value', 100000.0)
-    if 'swp_monthly_withdrawal_input' not in st.session_state:
-        st.session_state.swp_monthly_withdrawal_input = "5000.0"  # Initialize as a string
+    if 'swp_monthly_withdrawal' not in st.session_state:
+        st.session_state.swp_monthly_withdrawal = 5000.0
     if 'swp_tax_rate' not in st.session_state:
         st.session_state.swp_tax_rate = 20.0
-    if 'swp_tax_rate_input' not in st.session_state:
-        st.session_state.swp_tax_rate_input = "20.0"  # Initialize as a string
     if 'swp_withdraw_years' not in st.session_state:
         st.session_state.swp_withdraw_years = 20
-    if 'swp_withdraw_years_input' not in st.session_state:
-        st.session_state.swp_withdraw_years_input = "20"  # Initialize as a string
 
+    def format_amount(value):
+        return f"{value:.2f}"
 
-    # Callback functions for synchronization
-    def update_investment():
-        try:
-            value = float(st.session_state.swp_initial_investment_input)
-            st.session_state.swp_initial_investment = value
-            st.session_state.swp_initial_investment_slider = value
-        except ValueError:
-            pass
+    # Changing an input reruns only this fragment and the results nested in it, not the whole app
+    @st.fragment
+    def swp_inputs():
+        # Create input layout
+        col1, col2, col3 = st.columns(3)
 
-    # Callback functions for input synchronization
-    def update_investment_input():
-        st.session_state.swp_initial_investment_input = f"{st.session_state.swp_initial_investment_slider:.2f}"
+        with col1:
+            synced_input("Initial Investment Amount (₹)", 'swp_initial_investment',
+                         'swp_initial_investment_input', 'swp_initial_investment_slider',
+                         100.0, 1000000.0, step=100.0, text_format=format_amount)
 
-    def update_withdrawal_input():
-        st.session_state.swp_monthly_withdrawal_input = f"{st.session_state.swp_monthly_withdrawal_slider:.2f}"
+        with col2:
+            synced_input("Monthly Withdrawal Amount (₹)", 'swp_monthly_withdrawal',
+                         'swp_monthly_withdrawal_input', 'swp_monthly_withdrawal_slider',
+                         100.0, 50000.0, step=100.0, text_format=format_amount)
 
-    def update_tax_input():
-        st.session_state.swp_tax_rate_input = f"{st.session_state.swp_tax_rate_slider:.2f}"
+        with col3:
+            synced_input("Tax Rate on Withdrawals (%)", 'swp_tax_rate',
+                         'swp_tax_rate_input', 'swp_tax_rate_slider',
+                         0.0, 100.0, step=0.1, text_format=format_amount)
+            synced_input("Duration of Withdrawals (Years)", 'swp_withdraw_years',
+                         'swp_withdraw_years_input', 'swp_withdraw_years_slider',
+                         1, 50, step=1, cast=int, lower_bound=1)
+
+        # Capital-gains tax per SIP installment instead of a flat tax on the whole withdrawal
+        tax_lot_mode = st.checkbox("Tax only the gains, redeeming SIP installments first-in first-out", key="swp_tax_lot_mode")
+        tax_lot_rates = None
+        if tax_lot_mode:
+            if 'sip_schedule' not in st.session_state:
+                st.info("Set up your SIP in the SIP Calculator first; its monthly installments are used as the tax lots.")
+            else:
+                st.caption("The corpus is the SIP's final value, so the initial investment and flat tax rate above are not used.")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                short_term_tax_rate = st.number_input("Short-term Capital Gains Tax (%)", 0.0, 100.0, 20.0, key="swp_stcg_rate")
+            with col2:
+                long_term_tax_rate = st.number_input("Long-term Capital Gains Tax (%)", 0.0, 100.0, 12.5, key="swp_ltcg_rate")
+            with col3:
+                holding_period_months = st.number_input("Long-term After (Months)", 0, 120, 12, key="swp_holding_period")
+            tax_lot_rates = (short_term_tax_rate, long_term_tax_rate, holding_period_months)
+
+        swp_results(tax_lot_rates)
+
+    # Pressing the button reruns only the results
+    @st.fragment
+    def swp_results(tax_lot_rates):
+        # Results stay up after Calculate until an input changes, so other buttons in this fragment
+        # (the report bundle) do not hide them
+        calculation_inputs = (
+            st.session_state.swp_initial_investment, st.session_state.swp_monthly_withdrawal,
+            st.session_state.swp_tax_rate, st.session_state.swp_withdraw_years, tax_lot_rates
+        )
+        if st.button("Calculate SWP Details", key="calculate_swp"):
+            st.session_state['swp_calculated_inputs'] = calculation_inputs
+
+        # Calculate and display results
+        if st.session_state.get('swp_calculated_inputs') == calculation_inputs:
+            # Perform calculations
+            # Use st.session_state variables directly in calculations
+            if tax_lot_rates is not None and 'sip_schedule' in st.session_state:
+                short_term_tax_rate, long_term_tax_rate, holding_period_months = tax_lot_rates
+                swp_schedule = calculate_tax_lot_swp_schedule(
+                    st.session_state['sip_schedule'],
+                    st.session_state.swp_monthly_withdrawal,
+                    st.session_state.swp_withdraw_years * 12,
+                    short_term_tax_rate=short_term_tax_rate,
+                    long_term_tax_rate=long_term_tax_rate,
+                    holding_period_months=holding_period_months
+                )
+            else:
+                # Reuse this session's previous schedule so that changing only the duration extends or
+                # truncates it instead of recomputing every month
+                swp_schedule = calculate_swp_schedule(
+                    st.session_state.swp_initial_investment,
+                    st.session_state.swp_monthly_withdrawal,
+                    st.session_state.swp_tax_rate,
+                    st.session_state.swp_withdraw_years * 12,
+                    previous=st.session_state.get('swp_schedule')
+                )
+            st.session_state['swp_schedule'] = swp_schedule
+            total_withdrawals = swp_schedule['withdrawal'].sum()
+            after_tax_withdrawals = swp_schedule['after_tax_withdrawal'].sum()
+            remaining_balance = swp_schedule['balance'][-1]
+
+
+            # Display summary metrics
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Withdrawals (before tax)", f"₹{total_withdrawals:,.2f}")
+            with col2:
+                st.metric("Total Withdrawals (after tax)", f"₹{after_tax_withdrawals:,.2f}")
+            with col3:
+                st.metric("Remaining Balance", f"₹{remaining_balance:,.2f}")
+
+            # Calculate total tax paid
+            total_tax_paid = total_withdrawals - after_tax_withdrawals
+            st.metric("Total Tax Paid", f"₹{total_tax_paid:,.2f}")
+
+            # Annualized after-tax return of investing the corpus, the withdrawals and what remains
+            swp_xirr = calculate_xirr(*swp_cash_flows(
+                swp_schedule,
+                swp_schedule.meta.get('initial_investment', st.session_state.swp_initial_investment),
+                datetime.date.today()
+            ))
+            st.metric("XIRR (after tax)", "Not defined" if np.isnan(swp_xirr) else f"{swp_xirr * 100:,.2f}%")
+
+            swp_summary = {
+                'Initial Investment (₹)': float(swp_schedule.meta.get('initial_investment', st.session_state.swp_initial_investment)),
+                'Monthly Withdrawal (₹)': float(st.session_state.swp_monthly_withdrawal),
+                'Tax': "Capital gains per SIP installment" if tax_lot_rates is not None and 'sip_schedule' in st.session_state else f"{st.session_state.swp_tax_rate}% of each withdrawal",
+                'Withdrawal Duration (Years)': int(st.session_state.swp_withdraw_years),
+                'Total Withdrawals (before tax) (₹)': float(total_withdrawals),
+                'Total Withdrawals (after tax) (₹)': float(after_tax_withdrawals),
+                'Total Tax Paid (₹)': float(total_tax_paid),
+                'Remaining Balance (₹)': float(remaining_balance),
+                'XIRR (after tax) (%)': "Not defined" if np.isnan(swp_xirr) else float(swp_xirr * 100),
+            }
+
+            # Plot balance progression
+            st.subheader("Investment Balance Over Time")
+            balance_chart = go.Figure(swp_schedule.to_trace('month', 'balance'))
+            balance_chart.update_layout(title='Investment Balance Progression',
+                                        xaxis_title='Month Number', yaxis_title='Balance (₹)')
+            st.plotly_chart(balance_chart)
+
+            # Display monthly withdrawal details
+            st.subheader("Monthly Withdrawal Details")
+            monthly_data = swp_schedule.to_frame()
+
+            # Display the table
+            st.dataframe(swp_schedule.to_styler())
+
+            # Add the download button
+            excel_buffer = convert_df_to_excel(monthly_data)
+            st.download_button(
+                label="Download Table Data",
+                data=excel_buffer,
+                file_name=f"swp_monthly_details_.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                on_click="ignore"
+            )
 
-    def update_years_input():
-        st.session_state.swp_withdraw_years_input = str(st.session_state.swp_withdraw_years_slider)
+            report_bundle_panel('swp_report_bundle', {'swp': swp_schedule}, swp_summary, "swp_report_bundle.zip")
 
-    def update_investment_slider():
-        st.session_state.swp_initial_investment = st.session_state.swp_initial_investment_slider
-        st.session_state.swp_initial_investment_input = str(st.session_state.swp_initial_investment_slider)
+    swp_inputs()
 
-    def update_withdrawal_slider():
-        try:
-            st.session_state.swp_monthly_withdrawal_slider = float(st.session_state.swp_monthly_withdrawal_input)
-        except ValueError:
-            st.session_state.swp_monthly_withdrawal_input = f"{st.session_state.swp_monthly_withdrawal_slider:.2f}"
+# Goal Planner Section
+elif option == "Goal Planner":
+    st.header("🎯 Goal Planner")
+    st.write("Solve the inverse question directly instead of adjusting the calculator sliders. "
+             "Enter several values separated by semicolons (e.g. 5,000,000; 10,000,000) to compare many goals at once.")
 
-    def update_tax_slider():
+    def parse_amounts(text):
+        # Commas inside a number are thousands separators; a comma followed by a space also separates values
         try:
-            st.session_state.swp_tax_rate_slider = float(st.session_state.swp_tax_rate_input)
+            values = [float(value.replace(',', '').strip()) for value in text.replace(', ', ';').split(';') if value.strip()]
         except ValueError:
-            st.session_state.swp_tax_rate_input = f"{st.session_state.swp_tax_rate_slider:.2f}"
+            values = []
+        return np.array(values)
+
+    goal = st.radio(
+        "What do you want to solve for?",
+        [
+            "Monthly SIP for a target corpus",
+            "Return rate needed for a target corpus",
+            "Time needed to reach a target corpus",
+            "Maximum monthly SWP withdrawal",
+            "How long an SWP corpus lasts"
+        ],
+        key="goal_type"
+    )
 
-    def update_years_slider():
-        try:
-            st.session_state.swp_withdraw_years_slider = int(st.session_state.swp_withdraw_years_input)
-        except ValueError:
-            st.session_state.swp_withdraw_years_input = str(st.session_state.swp_withdraw_years_slider)
+    col1, col2 = st.columns(2)
 
-    # Create input layout
-    col1, col2, col3 = st.columns(3)
+    if goal in ["Monthly SIP for a target corpus", "Return rate needed for a target corpus", "Time needed to reach a target corpus"]:
+        with col1:
+            targets = parse_amounts(st.text_input(
+                "Target Corpus Values (₹, separate with ;)",
+                value="5,000,000; 10,000,000; 20,000,000",
+                key="goal_sip_targets"
+            ))
+        with col2:
+            if goal != "Return rate needed for a target corpus":
+                goal_rate = st.number_input("Expected Annual Return Rate (%)", 0.0, 50.0, 12.0, key="goal_sip_rate")
+            if goal != "Monthly SIP for a target corpus":
+                goal_contribution = st.number_input("Monthly Contribution Amount (₹)", 100.0, 1000000.0, 10000.0, step=100.0, key="goal_sip_contribution")
+            if goal != "Time needed to reach a target corpus":
+                goal_years = st.number_input("Investment Duration (Years)", 1, 50, 15, key="goal_sip_years")
+
+        if targets.size == 0:
+            st.warning("Please enter at least one valid target corpus.")
+        elif goal == "Monthly SIP for a target corpus":
+            goal_data = pd.DataFrame({
+                'Target Corpus': targets,
+                'Required Monthly SIP': solve_sip_contribution(targets, goal_rate / 100, goal_years)
+            })
+            st.dataframe(goal_data.style.format({'Target Corpus': '₹{:,.2f}', 'Required Monthly SIP': '₹{:,.2f}'}))
+        elif goal == "Return rate needed for a target corpus":
+            goal_data = pd.DataFrame({
+                'Target Corpus': targets,
+                'Required Annual Return (%)': solve_sip_rate(targets, goal_contribution, goal_years) * 100
+            })
+            st.dataframe(goal_data.style.format({'Target Corpus': '₹{:,.2f}', 'Required Annual Return (%)': '{:,.2f}%'}, na_rep='Not reachable'))
+        else:
+            months_needed = solve_sip_months(targets, goal_contribution, goal_rate / 100)
+            goal_data = pd.DataFrame({
+                'Target Corpus': targets,
+                'Months Needed': months_needed,
+                'Years Needed': months_needed / 12
+            })
+            st.dataframe(goal_data.style.format({'Target Corpus': '₹{:,.2f}', 'Months Needed': '{:,.0f}', 'Years Needed': '{:,.1f}'}, na_rep='Not reachable'))
 
-    with col1:
-        st.text_input(
-            "Initial Investment Amount (₹)",
-            value=str(st.session_state.swp_initial_investment),
-            key="swp_initial_investment_input",
-            on_change=update_investment
-        )
-        st.slider(
-            "Initial Investment Amount (₹)",
-            min_value=100.0,
-            max_value=1000000.0,
-            step=100.0,
-            value=st.session_state.swp_initial_investment,
-            key="swp_initial_investment_slider",
-            on_change=update_investment_slider
-        )
+    else:
+        with col1:
+            if goal == "Maximum monthly SWP withdrawal":
+                amounts = parse_amounts(st.text_input(
+                    "Initial Investment Values (₹, separate with ;)",
+                    value=f"{st.session_state.get('sip_future_value', 1000000.0):,.2f}; 5,000,000; 10,000,000",
+                    key="goal_swp_investments"
+                ))
+            else:
+                amounts = parse_amounts(st.text_input(
+                    "Monthly Withdrawal Values (₹, separate with ;)",
+                    value="5,000; 10,000; 20,000",
+                    key="goal_swp_withdrawals"
+                ))
+        with col2:
+            goal_rate = st.number_input("Expected Annual Return Rate (%)", 0.0, 50.0, 12.0, key="goal_swp_rate")
+            if goal == "Maximum monthly SWP withdrawal":
+                goal_years = st.number_input("Duration of Withdrawals (Years)", 1, 50, 25, key="goal_swp_years")
+            else:
+                goal_investment = st.number_input(
+                    "Initial Investment Amount (₹)", 100.0, value=float(st.session_state.get('sip_future_value', 1000000.0)),
+                    step=100.0, key="goal_swp_investment"
+                )
+
+        if amounts.size == 0:
+            st.warning("Please enter at least one valid amount.")
+        elif goal == "Maximum monthly SWP withdrawal":
+            goal_data = pd.DataFrame({
+                'Initial Investment': amounts,
+                'Maximum Monthly Withdrawal': solve_swp_withdrawal(amounts, goal_years, goal_rate / 100)
+            })
+            st.dataframe(goal_data.style.format({'Initial Investment': '₹{:,.2f}', 'Maximum Monthly Withdrawal': '₹{:,.2f}'}))
+        else:
+            months_lasting = solve_swp_months(goal_investment, amounts, goal_rate / 100)
+            goal_data = pd.DataFrame({
+                'Monthly Withdrawal': amounts,
+                'Months Funded': months_lasting,
+                'Years Funded': months_lasting / 12
+            })
+            st.dataframe(goal_data.style.format({'Monthly Withdrawal': '₹{:,.2f}', 'Months Funded': '{:,.0f}', 'Years Funded': '{:,.1f}'}))
+            if np.isinf(months_lasting).any():
+                st.info("Withdrawals shown as 'inf' are covered by the returns alone, so the corpus never runs out.")
 
+# Retirement Planner Section
+elif option == "Retirement Planner":
+    st.header("🏖️ Retirement Planner")
+    st.write("Simulate SIP contributions until retirement followed by monthly withdrawals as one timeline.")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        current_age = st.number_input("Current Age", 18, 80, 30, key="lifecycle_current_age")
+        retirement_age = st.number_input("Retirement Age", current_age, 90, max(current_age, 60), key="lifecycle_retirement_age")
+        end_age = st.number_input("Plan Until Age", retirement_age + 1, 110, max(retirement_age + 1, 85), key="lifecycle_end_age")
+        gap_years = st.number_input("Years Between Retirement and First Withdrawal", 0, 30, 0, key="lifecycle_gap_years")
     with col2:
-        monthly_withdrawal = st.text_input(
-        "Monthly Withdrawal Amount (₹)",
-        value=str(st.session_state.swp_monthly_withdrawal_input),
-        key="swp_monthly_withdrawal_input",
-        on_change=update_withdrawal_slider
+        lifecycle_contribution = st.number_input(
+            "Monthly Contribution Amount (₹)", 100.0, 1000000.0,
+            min(max(float(st.session_state.get('monthly_contribution', 10000.0)), 100.0), 1000000.0),
+            step=100.0, key="lifecycle_contribution"
         )
+        pre_retirement_return = st.number_input("Annual Return Before Retirement (%)", 0.0, 50.0, 12.0, key="lifecycle_pre_return")
+        post_retirement_return = st.number_input("Annual Return After Retirement (%)", 0.0, 50.0, 8.0, key="lifecycle_post_return")
+    with col3:
+        lifecycle_withdrawal = st.number_input("Monthly Withdrawal Amount (₹)", 100.0, 10000000.0, 50000.0, step=100.0, key="lifecycle_withdrawal")
+        lifecycle_tax_rate = st.number_input("Tax Rate on Withdrawals (%)", 0.0, 100.0, 20.0, key="lifecycle_tax_rate")
 
-        monthly_withdrawal_slider = st.slider(
-            "Monthly Withdrawal Amount (₹)",
-            min_value=100.0,
-            max_value=50000.0,
-            step=100.0,
-            value=float(monthly_withdrawal) if monthly_withdrawal else 5000.0,
-            key="swp_monthly_withdrawal_slider",
-            on_change=update_withdrawal_input
-        )
+    lifecycle = simulate_lifecycle(
+        current_age, retirement_age, end_age, lifecycle_contribution,
+        pre_retirement_return / 100, post_retirement_return / 100,
+        lifecycle_withdrawal, lifecycle_tax_rate, gap_years
+    )
 
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Corpus at Retirement", f"₹{lifecycle.meta['retirement_balance']:,.2f}")
+    with col2:
+        st.metric("Total Withdrawals (after tax)", f"₹{lifecycle['after_tax_withdrawal'].sum():,.2f}")
     with col3:
-        tax_rate = st.text_input(
-            "Tax Rate on Withdrawals (%)",
-            value=st.session_state.swp_tax_rate_input,
-            key="swp_tax_rate_input",
-            on_change=update_tax_slider
-        )
-        tax_rate_slider = st.slider(
-            "Tax Rate on Withdrawals (%)",
-            min_value=0.0,
-            max_value=100.0,
-            step=0.1,
-            value=float(tax_rate) if tax_rate else 20.0,
-            key="swp_tax_rate_slider",
-            on_change=update_tax_input
-        )
-        
-        withdraw_years = st.text_input(
-            "Duration of Withdrawals (Years)",
-            value=st.session_state.swp_withdraw_years_input,
-            key="swp_withdraw_years_input",
-            on_change=update_years_slider
+        if lifecycle.meta['depletion_month']:
+            st.metric("Corpus Runs Out at Age", f"{current_age + (lifecycle.meta['depletion_month'] - 1) / 12:.1f}")
+        else:
+            st.metric("Balance at Age " + str(end_age), f"₹{lifecycle['balance'][-1]:,.2f}")
+
+    lifecycle_data = lifecycle.to_frame()
+    lifecycle_chart = px.line(lifecycle_data, x='Age', y='Balance', color='Phase',
+                              title='Corpus Over Your Lifetime',
+                              labels={'Balance': 'Balance (₹)'})
+    st.plotly_chart(lifecycle_chart)
+
+    # Compare many retirement ages in a single vectorized simulation
+    st.subheader("Compare Retirement Ages")
+    if end_age - 1 > current_age:
+        age_range = st.slider(
+            "Retirement Ages to Compare",
+            current_age, end_age - 1, (max(current_age, retirement_age - 5), min(end_age - 1, retirement_age + 5)),
+            key="lifecycle_age_range"
         )
-        withdraw_years_slider = st.slider(
-            "Duration of Withdrawals (Years)",
-            min_value=1,
-            max_value=50,
-            step=1,
-            value=int(withdraw_years) if withdraw_years else 20,
-            key="swp_withdraw_years_slider",
-            on_change=update_years_input
+    else:
+        # A slider needs two distinct ends; only retiring now is possible here
+        age_range = (current_age, current_age)
+    comparison = compare_retirement_ages(
+        np.arange(age_range[0], age_range[1] + 1), current_age, end_age, lifecycle_contribution,
+        pre_retirement_return / 100, post_retirement_return / 100,
+        lifecycle_withdrawal, lifecycle_tax_rate, gap_years
+    )
+    st.dataframe(comparison.style.format({
+        'Retirement Age': '{:.0f}',
+        'Total Invested': '₹{:,.2f}',
+        'Corpus at Retirement': '₹{:,.2f}',
+        'Total Withdrawals (before tax)': '₹{:,.2f}',
+        'Total Withdrawals (after tax)': '₹{:,.2f}',
+        'Final Balance': '₹{:,.2f}',
+        'Corpus Runs Out at Age': '{:.1f}'
+    }, na_rep='Never'))
+
+# Historical Backtest Section
+elif option == "Historical Backtest":
+    st.header("📜 Historical SIP Backtest")
+    st.write("Run the SIP over every historical start month of a daily NAV or index series "
+             "to see the worst, median and best outcomes actually achieved.")
+
+    nav_path = st.text_input("NAV/Index File (CSV or Parquet with date and NAV columns)", key="backtest_path")
+    col1, col2 = st.columns(2)
+    with col1:
+        backtest_contribution = st.number_input(
+            "Monthly Contribution Amount (₹)", 100.0, 1000000.0,
+            min(max(float(st.session_state.get('monthly_contribution', 10000.0)), 100.0), 1000000.0),
+            step=100.0, key="backtest_contribution"
         )
+    with col2:
+        backtest_years = st.number_input("Investment Duration (Years)", 1, 40, 10, key="backtest_years")
 
-    # Calculate and display results
-    if st.button("Calculate SWP Details", key="calculate_swp"):
-        # Perform calculations
-        # Use st.session_state variables directly in calculations
-        total_withdrawals, after_tax_withdrawals, remaining_balance, monthly_balances, after_tax_withdrawal_history = calculate_swp(
-            st.session_state.swp_initial_investment_slider,
-            st.session_state.swp_monthly_withdrawal_slider,
-            st.session_state.swp_tax_rate_slider,
-            st.session_state.swp_withdraw_years_slider
+    if not nav_path:
+        st.info("Enter the path of a local NAV or index file to run the backtest.")
+    elif not os.path.exists(nav_path):
+        st.error(f"File not found: {nav_path}")
+    else:
+        try:
+            nav_dates, navs = load_cached_nav_series(nav_path, os.path.getmtime(nav_path))
+        except Exception as e:
+            st.error(f"Could not read the NAV file: {str(e)}")
+            st.stop()
+
+        backtest = backtest_sip(nav_dates, navs, backtest_contribution, backtest_years)
+        if len(backtest) == 0:
+            st.warning(f"The series from {nav_dates[0]} to {nav_dates[-1]} is shorter than {backtest_years} years.")
+        else:
+            st.caption(f"{len(backtest)} rolling {backtest_years}-year windows from {nav_dates[0]} to {nav_dates[-1]}")
+            st.dataframe(summarize_backtest(backtest).style.format({
+                'XIRR (%)': '{:,.2f}%',
+                'Final Value': '₹{:,.2f}'
+            }))
+
+            backtest_data = backtest.to_frame()
+            col1, col2 = st.columns(2)
+            with col1:
+                st.plotly_chart(px.histogram(backtest_data, x='XIRR (%)', nbins=40,
+                                             title='Distribution of XIRR'))
+            with col2:
+                final_value_chart = go.Figure(backtest.to_trace('start_date', 'final_value'))
+                final_value_chart.update_layout(title='Final Value by Start Date',
+                                                xaxis_title='Start Date', yaxis_title='Final Value (₹)')
+                st.plotly_chart(final_value_chart)
+
+            with st.expander("All Windows"):
+                st.dataframe(backtest.to_styler(), height=400)
+
+# Scenario Comparison Section
+elif option == "Scenario Comparison":
+    st.header("⚖️ Scenario Comparison")
+    st.write("Compare plans side by side. Each row is one plan: a SIP with a yearly step-up followed by "
+             "monthly withdrawals. Add, edit or delete rows; all plans are simulated together in one pass.")
+
+    DEFAULT_SCENARIOS = pd.DataFrame({
+        'Scenario': ['Base Plan', 'Yearly Step-up', 'Higher Return'],
+        'Monthly Contribution (₹)': [10000.0, 10000.0, 10000.0],
+        'Annual Return (%)': [12.0, 12.0, 14.0],
+        'Investment Years': [20, 20, 20],
+        'Yearly Step-up (%)': [0.0, 10.0, 0.0],
+        'Monthly Withdrawal (₹)': [50000.0, 50000.0, 50000.0],
+        'Withdrawal Years': [25, 25, 25],
+        'Withdrawal Return (%)': [8.0, 8.0, 8.0],
+        'Tax Rate (%)': [10.0, 10.0, 10.0],
+    })
+
+    # Editing the table reruns only this fragment
+    @st.fragment
+    def scenario_comparison():
+        scenario_table = st.data_editor(
+            DEFAULT_SCENARIOS,
+            num_rows="dynamic",
+            hide_index=True,
+            key="scenario_editor",
+            column_config={
+                'Monthly Contribution (₹)': st.column_config.NumberColumn(min_value=0.0, format="₹%.2f", default=10000.0),
+                'Annual Return (%)': st.column_config.NumberColumn(min_value=-50.0, max_value=100.0, default=12.0),
+                'Investment Years': st.column_config.NumberColumn(min_value=0, max_value=60, step=1, default=20),
+                'Yearly Step-up (%)': st.column_config.NumberColumn(min_value=0.0, max_value=100.0, default=0.0),
+                'Monthly Withdrawal (₹)': st.column_config.NumberColumn(min_value=0.0, format="₹%.2f", default=50000.0),
+                'Withdrawal Years': st.column_config.NumberColumn(min_value=0, max_value=60, step=1, default=25),
+                'Withdrawal Return (%)': st.column_config.NumberColumn(min_value=-50.0, max_value=100.0, default=8.0),
+                'Tax Rate (%)': st.column_config.NumberColumn(min_value=0.0, max_value=100.0, default=10.0),
+            }
         )
-
-
-        # Display summary metrics
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Withdrawals (before tax)", f"₹{total_withdrawals:,.2f}")
-        with col2:
-            st.metric("Total Withdrawals (after tax)", f"₹{after_tax_withdrawals:,.2f}")
-        with col3:
-            st.metric("Remaining Balance", f"₹{remaining_balance:,.2f}")
-
-        # Calculate total tax paid
-        total_tax_paid = total_withdrawals - after_tax_withdrawals
-        st.metric("Total Tax Paid", f"₹{total_tax_paid:,.2f}")
-
-        # Create visualization data
-        months = list(range(1, len(monthly_balances) + 1))
-        
-        # Plot balance progression
-        st.subheader("Investment Balance Over Time")
-        balance_data = pd.DataFrame({
-            'Month': months,
-            'Balance': monthly_balances
-        })
-        balance_chart = px.line(balance_data, x='Month', y='Balance',
-                              title='Investment Balance Progression',
-                              labels={'Balance': 'Balance (₹)', 'Month': 'Month Number'})
-        st.plotly_chart(balance_chart)
-
-        # Display monthly withdrawal details
-        st.subheader("Monthly Withdrawal Details")
-        monthly_data = pd.DataFrame({
-            'Month': months,
-            'Withdrawal (before tax)': [monthly_withdrawal_slider] * len(months),
-            'Withdrawal (after tax)': after_tax_withdrawal_history,
-            'Tax Paid': [(monthly_withdrawal_slider - amt) for amt in after_tax_withdrawal_history],
-            'Remaining Balance': monthly_balances
-        })
-
-        # Display the table
-        st.dataframe(monthly_data.style.format({
-            'Withdrawal (before tax)': '₹{:,.2f}',
-            'Withdrawal (after tax)': '₹{:,.2f}',
-            'Tax Paid': '₹{:,.2f}',
-            'Remaining Balance': '₹{:,.2f}'
-        }))
-
-        # Add the download button
-        excel_buffer = convert_df_to_excel(monthly_data)
-        st.download_button(
-            label="Download Table Data",
-            data=excel_buffer,
-            file_name=f"swp_monthly_details_.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        if scenario_table.empty:
+            st.info("Add at least one scenario to compare.")
+            return
+
+        # Blank cells in new rows count as zero; unnamed rows are numbered
+        numbers = scenario_table.drop(columns='Scenario').apply(pd.to_numeric, errors='coerce').fillna(0.0)
+        names = [
+            name if isinstance(name, str) and name.strip() else f"Scenario {index + 1}"
+            for index, name in enumerate(scenario_table['Scenario'])
+        ]
+
+        # Every scenario is one row of the same batched simulation
+        scenarios = simulate_scenarios(
+            numbers['Monthly Contribution (₹)'].to_numpy(),
+            numbers['Annual Return (%)'].to_numpy() / 100,
+            numbers['Investment Years'].to_numpy(),
+            step_up_rate=numbers['Yearly Step-up (%)'].to_numpy() / 100,
+            monthly_withdrawal=numbers['Monthly Withdrawal (₹)'].to_numpy(),
+            withdraw_years=numbers['Withdrawal Years'].to_numpy(),
+            withdrawal_return_rate=numbers['Withdrawal Return (%)'].to_numpy() / 100,
+            tax_rate=numbers['Tax Rate (%)'].to_numpy()
         )
+        summary = summarize_scenarios(scenarios, names, datetime.date.today())
+
+        # Overlaid balances, one line per scenario
+        scenario_chart = go.Figure([scenarios.row(index).to_trace('month', 'balance', name=name)
+                                    for index, name in enumerate(names)])
+        scenario_chart.update_layout(title='Balance Over Time by Scenario',
+                                     xaxis_title='Month Number', yaxis_title='Balance (₹)')
+        st.plotly_chart(scenario_chart)
+
+        summary_formats = {
+            'Total Invested': '₹{:,.2f}',
+            'Corpus at End of SIP': '₹{:,.2f}',
+            'Total Withdrawals (before tax)': '₹{:,.2f}',
+            'Total Withdrawals (after tax)': '₹{:,.2f}',
+            'Final Balance': '₹{:,.2f}',
+            'XIRR (%)': '{:,.2f}%',
+            'Corpus Runs Out in Month': '{:.0f}',
+        }
+        st.subheader("Scenario Results")
+        st.dataframe(summary.style.format(summary_formats, na_rep='Never'), hide_index=True)
+
+        # Differences from the first scenario; the run-out month stays blank unless both plans run out
+        if len(summary) > 1:
+            st.subheader(f"Difference from {names[0]}")
+            differences = summary.set_index('Scenario')
+            differences = (differences - differences.iloc[0]).iloc[1:].reset_index()
+            st.dataframe(differences.style.format(
+                {**{column: '{:+,.2f}' if column == 'XIRR (%)' else '₹{:+,.2f}' for column in summary_formats},
+                 'Corpus Runs Out in Month': '{:+.0f}'},
+                na_rep='-'
+            ), hide_index=True)
+
+    scenario_comparison()
 
 # Chatbot Section
 if option == "Chatbot":
     st.header("💬 Investment Chatbot")
     st.write("Ask me any investment-related question!")
 
-    # Load the QA system
-    qa_chain = load_qa_system()
+    # Show how far the background warm-up of the QA system has got, polling only this fragment
+    # while it is still loading
+    warming_up = not qa_warmup.ready
+
+    @st.fragment(run_every=2 if warming_up else None)
+    def chatbot_status():
+        if qa_warmup.ready and warming_up:
+            # Rerun once more so the status is drawn again without the polling timer
+            st.rerun()
+        if qa_warmup.ready and qa_warmup.qa_chain is not None:
+            st.success("Chatbot is ready.")
+        elif qa_warmup.ready:
+            st.error(f"Chatbot could not be loaded: {qa_warmup.status}")
+        else:
+            st.info(f"Chatbot is warming up ({qa_warmup.status}). You can ask now; the answer will wait until it is ready.")
+
+    chatbot_status()
     
     # Initialize chat history in session state if it doesn't exist
     if "chat_history" not in st.session_state:
@@ -582,40 +868,46 @@ if option == "Chatbot":
         response = response.split("Sources:")[0].strip()
         return response
 
-    # Create the text area for user input
-    user_query = st.text_area(
-        "Your question:", 
-        height=100, 
-        key="user_input"
-    )
+    # Asking a question reruns only the chat, not the rest of the page
+    @st.fragment
+    def chatbot():
+        # Create the text area for user input
+        user_query = st.text_area(
+            "Your question:", 
+            height=100, 
+            key="user_input"
+        )
 
-    # Handle submit button click
-    if st.button("Ask", key="ask_chatbot"):
-        if user_query.strip():
-            with st.spinner("Getting response..."):
-                try:
-                    # Get response from the QA system
-                    response = get_answer(qa_chain, user_query)
+        # Handle submit button click
+        if st.button("Ask", key="ask_chatbot"):
+            if user_query.strip():
+                with st.spinner("Getting response..."):
+                    try:
+                        # Get response from the QA system, waiting for the warm-up if it is still running
+                        qa_chain = qa_warmup.wait()
+                        response = get_answer(qa_chain, user_query)
                     
-                    # Clean the response before storing
-                    cleaned_response = clean_response(response)
+                        # Clean the response before storing
+                        cleaned_response = clean_response(response)
                     
-                    # Add the Q&A pair to chat history
-                    st.session_state.chat_history.append({
-                        "question": user_query,
-                        "answer": cleaned_response
-                    })
+                        # Add the Q&A pair to chat history
+                        st.session_state.chat_history.append({
+                            "question": user_query,
+                            "answer": cleaned_response
+                        })
                     
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
-        else:
-            st.warning("Please enter a question.")
-
-    # Display chat history
-    if st.session_state.chat_history:
-        st.subheader("Chat History")
-        for i, chat in enumerate(reversed(st.session_state.chat_history)):
-            with st.container():
-                st.markdown("---")
-                st.write("**Q:** " + chat["question"])
-                st.write("**A:** " + chat["answer"])
+                    except Exception as e:
+                        st.error(f"An error occurred: {str(e)}")
+            else:
+                st.warning("Please enter a question.")
+
+        # Display chat history
+        if st.session_state.chat_history:
+            st.subheader("Chat History")
+            for i, chat in enumerate(reversed(st.session_state.chat_history)):
+                with st.container():
+                    st.markdown("---")
+                    st.write("**Q:** " + chat["question"])
+                    st.write("**A:** " + chat["answer"])
+
+    chatbot()
@@ -0,0 +1,276 @@
+"""
+Headless load test for the investment calculator.
+
+Drives N simulated sessions of app.py concurrently in one process with Streamlit's AppTest,
+walking each through the SIP, SWP and Chatbot flows with randomized slider inputs. The QA
+system is replaced by a stub chain, so no models or AWS credentials are needed. For each
+number of sessions it reports rerun latency percentiles, the memory held in each session's
+state and the total resident memory of the process.
+
+AppTest swaps process-wide Streamlit state on every run, so runs cannot overlap; they are
+serialized like script runs contending for the interpreter lock of a single server process,
+and a rerun's latency includes the time it waits for the runs of other sessions.
+
+Usage:
+    python load_test.py --sessions 1,5,10,20 --steps 10
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+from streamlit.testing.v1 import AppTest
+
+import utils
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+    import resource
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+
+# Only one AppTest run may be in flight at a time
+RUN_LOCK = threading.Lock()
+
+QUESTIONS = [
+    "What is a systematic investment plan?",
+    "How are mutual fund withdrawals taxed?",
+    "Should I increase my SIP every year?",
+    "What is the difference between SIP and SWP?",
+]
+
+
+class StubQAChain:
+    """
+    Stands in for the RetrievalQA chain, answering after a fixed delay instead of running the LLM.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def __call__(self, inputs):
+        time.sleep(self.latency)
+        return {
+            'result': f"Stub answer to: {inputs['query']}",
+            'source_documents': [Document(page_content="", metadata={'filename': 'stub', 'shard': 'stub'})]
+        }
+
+
+def deep_size(value, seen=None):
+    """
+    Estimate the memory held by a session state value, following containers and object attributes.
+
+    Parameters:
+    value (object): The value to measure.
+    seen (set): Ids of objects already counted, so shared objects are counted once.
+
+    Returns:
+    int: Approximate size in bytes.
+    """
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) if value.base is not None else value.nbytes + sys.getsizeof(value)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, bytearray)):
+        return size
+    if isinstance(value, dict):
+        return size + sum(deep_size(key, seen) + deep_size(item, seen) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(deep_size(item, seen) for item in value)
+    if hasattr(value, '__dict__'):
+        return size + deep_size(vars(value), seen)
+    return size
+
+
+def process_rss():
+    """
+    Resident memory of this process in bytes; the peak value when psutil is not installed.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def select_page(at, page, rerun):
+    if at.sidebar.selectbox(key="selected_option").value != page:
+        at.sidebar.selectbox(key="selected_option").select(page)
+        rerun()
+
+
+def sip_flow(at, rng, rerun):
+    select_page(at, "SIP Calculator", rerun)
+    at.slider(key="sip_monthly_contribution_slider").set_value(float(rng.randrange(100, 1000000, 100)))
+    rerun()
+    at.slider(key="sip_annual_return_rate_slider").set_value(round(rng.uniform(0.0, 50.0), 1))
+    rerun()
+    at.slider(key="sip_investment_years_slider").set_value(rng.randint(1, 50))
+    rerun()
+
+
+def swp_flow(at, rng, rerun):
+    select_page(at, "SWP Calculator", rerun)
+    at.slider(key="swp_initial_investment_slider").set_value(float(rng.randrange(100, 1000000, 100)))
+    rerun()
+    at.slider(key="swp_monthly_withdrawal_slider").set_value(float(rng.randrange(100, 50000, 100)))
+    rerun()
+    at.slider(key="swp_tax_rate_slider").set_value(round(rng.uniform(0.0, 100.0), 1))
+    rerun()
+    at.slider(key="swp_withdraw_years_slider").set_value(rng.randint(1, 50))
+    rerun()
+    at.button(key="calculate_swp").click()
+    rerun()
+
+
+def chatbot_flow(at, rng, rerun):
+    select_page(at, "Chatbot", rerun)
+    at.text_area(key="user_input").input(rng.choice(QUESTIONS))
+    rerun()
+    at.button(key="ask_chatbot").click()
+    rerun()
+
+
+FLOWS = {
+    'sip': sip_flow,
+    'swp': swp_flow,
+    'chatbot': chatbot_flow,
+}
+
+
+def run_session(seed, steps, flows, timeout, think_time):
+    """
+    Simulate one user session, running randomly chosen flows one after another.
+
+    Parameters:
+    seed (int): Seed for this session's random choices.
+    steps (int): Number of flows to run.
+    flows (list): Names of the flows to choose from.
+    timeout (float): Seconds allowed for a single rerun.
+    think_time (float): Longest pause before each interaction, in seconds.
+
+    Returns:
+    tuple: The AppTest, the rerun latencies in seconds and the exception messages.
+    """
+    rng = random.Random(seed)
+    latencies, errors = [], []
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def rerun():
+        # Pause like a user between interactions; only the rerun itself is timed
+        time.sleep(rng.uniform(0.0, think_time))
+        start = time.perf_counter()
+        with RUN_LOCK:
+            at.run()
+        latencies.append(time.perf_counter() - start)
+        errors.extend(exception.message for exception in at.exception)
+
+    rerun()
+    for _ in range(steps):
+        FLOWS[rng.choice(flows)](at, rng, rerun)
+    return at, latencies, errors
+
+
+def run_level(sessions, steps, flows, timeout, think_time, seed):
+    """
+    Run a number of sessions concurrently and summarize their reruns.
+
+    Parameters:
+    sessions (int): Number of concurrent sessions.
+    steps (int): Number of flows each session runs.
+    flows (list): Names of the flows to choose from.
+    timeout (float): Seconds allowed for a single rerun.
+    think_time (float): Longest pause before each interaction, in seconds.
+    seed (int): Base seed; session i uses seed + i.
+
+    Returns:
+    tuple: One row of the report and the exception messages of all sessions.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = list(executor.map(
+            lambda index: run_session(seed + index, steps, flows, timeout, think_time), range(sessions)
+        ))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for _, session_latencies, _ in results for latency in session_latencies]) * 1000
+    errors = [error for _, _, session_errors in results for error in session_errors]
+    session_bytes = [deep_size(dict(at.session_state.items())) for at, _, _ in results]
+    rss = process_rss()
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        'Sessions': sessions,
+        'Reruns': len(latencies),
+        'Reruns/s': len(latencies) / elapsed,
+        'p50 (ms)': p50,
+        'p90 (ms)': p90,
+        'p99 (ms)': p99,
+        'Max (ms)': latencies.max(),
+        'Errors': len(errors),
+        'Session State (KB)': np.mean(session_bytes) / 1024,
+        'RSS (MB)': rss / 1024 ** 2,
+    }, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the investment calculator with concurrent simulated sessions.")
+    parser.add_argument("--sessions", default="1,5,10,20",
+                        help="Comma-separated numbers of concurrent sessions to try, in order (default: 1,5,10,20)")
+    parser.add_argument("--steps", type=int, default=10, help="Flows run by each session (default: 10)")
+    parser.add_argument("--flows", default="sip,swp,chatbot",
+                        help="Comma-separated flows to choose from: sip, swp, chatbot (default: all)")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="Longest random pause before each interaction, in seconds (default: 1.0)")
+    parser.add_argument("--llm-latency", type=float, default=0.5,
+                        help="Seconds the stub QA chain takes to answer (default: 0.5)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds allowed for a single rerun (default: 60)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--output", help="Also write the report to this CSV file")
+    args = parser.parse_args()
+
+    flows = [flow.strip() for flow in args.flows.split(',') if flow.strip()]
+    unknown = [flow for flow in flows if flow not in FLOWS]
+    if unknown or not flows:
+        parser.error(f"Unknown flows: {', '.join(unknown)}" if unknown else "No flows given")
+
+    # The app loads styles.css relative to the working directory
+    os.chdir(APP_DIR)
+    # app.py looks initialize_qa_bot up in utils when its cached warm-up starts, so the stub
+    # replaces the models for every session
+    utils.initialize_qa_bot = lambda progress=None: StubQAChain(args.llm_latency)
+
+    rows = []
+    for sessions in (int(value) for value in args.sessions.split(',')):
+        row, errors = run_level(sessions, args.steps, flows, args.timeout, args.think_time, args.seed)
+        rows.append(row)
+        print(f"{sessions} sessions: {row['Reruns']} reruns, p50 {row['p50 (ms)']:,.1f} ms, "
+              f"p99 {row['p99 (ms)']:,.1f} ms, RSS {row['RSS (MB)']:,.1f} MB", flush=True)
+        for error in sorted(set(errors)):
+            print(f"  Error: {error}")
+        gc.collect()
+
+    report = pd.DataFrame(rows)
+    print()
+    print(report.to_string(index=False, float_format=lambda value: f"{value:,.1f}"))
+    if args.output:
+        report.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
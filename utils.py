@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -5,17 +6,24 @@ import boto3
 from io import BytesIO
 import os
 import io
-import torch
+import hashlib
+import shutil
+import heapq
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from langchain_aws import ChatBedrock
 from langchain.vectorstores import FAISS
 from langchain.embeddings import SentenceTransformerEmbeddings
 from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_community.llms import HuggingFacePipeline
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline, AutoModelForSeq2SeqLM
 import warnings
 
 
@@ -24,36 +32,194 @@ warnings.filterwarnings('ignore', category=FutureWarning)
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
 
-# Load the FAISS index from the saved file
-vectorstore_faiss = FAISS.load_local("INVSTMT_DB", SentenceTransformerEmbeddings(), allow_dangerous_deserialization=True)
+# Models used by the chatbot. A local copy of each is kept under QA_MODEL_SNAPSHOT_DIR (weights
+# in safetensors format) so later start-ups load from disk and work offline.
+QA_MODEL_NAME = "facebook/bart-large-cnn"  # Can also use "google/flan-t5-small" for an even smaller model
+QA_EMBEDDING_MODEL_NAME = "thenlper/gte-small"
+QA_MODEL_SNAPSHOT_DIR = os.environ.get('QA_MODEL_SNAPSHOT_DIR', 'models')
 
-# Load the embedding model again if necessary
-embedding_function = SentenceTransformerEmbeddings(model_name="thenlper/gte-small")
+# FAISS stores searched by the chatbot, treated as shards of one index. Override with a
+# comma-separated list of directories in the QA_INDEX_SHARDS environment variable.
+QA_INDEX_SHARDS = [
+    path.strip() for path in os.environ.get('QA_INDEX_SHARDS', 'INVSTMT_DB,INVSTMT').split(',') if path.strip()
+]
 
-def initialize_qa_bot():
+_shard_executor = None
+
+
+def _get_shard_executor():
+    global _shard_executor
+    if _shard_executor is None:
+        _shard_executor = ThreadPoolExecutor(max_workers=max(len(QA_INDEX_SHARDS), 1), thread_name_prefix='qa-shard')
+    return _shard_executor
+
+
+def load_index_shards(paths, embedding_function):
+    """
+    Load each FAISS store concurrently, skipping directories that do not exist.
+
+    Returns:
+    dict: Shard name (its directory) mapped to the loaded FAISS store
+    """
+    existing = [path for path in paths if os.path.isdir(path)]
+    for path in paths:
+        if path not in existing:
+            print(f"Skipping missing index shard: {path}")
+
+    futures = {
+        path: _get_shard_executor().submit(FAISS.load_local, path, embedding_function, allow_dangerous_deserialization=True)
+        for path in existing
+    }
+    return {path: future.result() for path, future in futures.items()}
+
+
+def search_shards(shards, query, k=3):
+    """
+    Search every shard concurrently and merge the hits into a global top-k.
+
+    The query is embedded once and the vector is searched in each shard on the thread pool. All
+    shards use the same embedding model, so their L2 distances are comparable and the k smallest
+    across shards form the global top-k.
+
+    Parameters:
+    shards (dict): Shard name mapped to a FAISS store
+    query (str): Question to search for
+    k (int): Number of documents to return
+
+    Returns:
+    Tuple[list, dict]: Top-k documents (best first), each tagged with its shard, score and that
+    shard's search time, and the search time of each shard in seconds
+    """
+    if not shards:
+        return [], {}
+
+    query_vector = next(iter(shards.values())).embeddings.embed_query(query)
+
+    def search(name, store):
+        started = time.perf_counter()
+        hits = store.similarity_search_with_score_by_vector(query_vector, k=k)
+        return name, hits, time.perf_counter() - started
+
+    futures = [_get_shard_executor().submit(search, name, store) for name, store in shards.items()]
+    candidates = []
+    timings = {}
+    for future in futures:
+        name, hits, seconds = future.result()
+        timings[name] = seconds
+        candidates.extend((float(score), name, doc) for doc, score in hits)
+
+    # Copy the winners rather than tagging the stored documents, which all sessions share
+    documents = [
+        Document(page_content=doc.page_content, metadata={
+            **doc.metadata, 'shard': name, 'score': score, 'search_seconds': timings[name]
+        })
+        for score, name, doc in heapq.nsmallest(k, candidates, key=lambda candidate: candidate[0])
+    ]
+    return documents, timings
+
+
+class ShardedRetriever(BaseRetriever):
+    """LangChain retriever over several FAISS shards, merging their results into one top-k."""
+
+    shards: dict
+    k: int = 3
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        # The retriever is shared by all sessions, so the timings travel with each query's documents
+        documents, _ = search_shards(self.shards, query, self.k)
+        return documents
+
+
+def _snapshot_path(model_name, snapshot_dir):
+    return os.path.join(snapshot_dir, model_name.split('/')[-1])
+
+
+def _save_snapshot(path, save):
+    # Save into a scratch directory and move it into place only once complete, so an interrupted
+    # download never leaves a directory that later runs would take for a finished snapshot
+    partial_path = f"{path}.partial"
+    shutil.rmtree(partial_path, ignore_errors=True)
+    save(partial_path)
+    os.replace(partial_path, path)
+
+
+def snapshot_qa_models(snapshot_dir=QA_MODEL_SNAPSHOT_DIR):
+    """
+    Download the chatbot's models once and save them locally, with weights in safetensors format.
+
+    Parameters:
+    snapshot_dir (str): Directory to store the snapshots in
+
+    Returns:
+    Tuple[str, str]: Paths of the language model and embedding model snapshots
+    """
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    model_path = _snapshot_path(QA_MODEL_NAME, snapshot_dir)
+    if not os.path.isdir(model_path):
+        def save_model(path):
+            AutoTokenizer.from_pretrained(QA_MODEL_NAME).save_pretrained(path)
+            AutoModelForSeq2SeqLM.from_pretrained(QA_MODEL_NAME).save_pretrained(path, safe_serialization=True)
+        _save_snapshot(model_path, save_model)
+
+    embedding_path = _snapshot_path(QA_EMBEDDING_MODEL_NAME, snapshot_dir)
+    if not os.path.isdir(embedding_path):
+        _save_snapshot(
+            embedding_path,
+            lambda path: SentenceTransformer(QA_EMBEDDING_MODEL_NAME).save(path, safe_serialization=True)
+        )
+
+    return model_path, embedding_path
+
+
+def initialize_qa_bot(progress=None):
+    """
+    Load the embedding model, index shards and language model and build the QA chain.
+
+    Parameters:
+    progress (callable, optional): Called with a short description of each loading step
+
+    Returns:
+    RetrievalQA: The QA chain, or None if loading failed
+    """
+    progress = progress or print
     try:
+        import torch
+        from transformers import AutoTokenizer, pipeline, AutoModelForSeq2SeqLM
+
         print("Loading models... This might take a minute on first run...")
+
+        # Prefer the local snapshot; create it on the first run so later start-ups skip the download
+        model_path = _snapshot_path(QA_MODEL_NAME, QA_MODEL_SNAPSHOT_DIR)
+        embedding_path = _snapshot_path(QA_EMBEDDING_MODEL_NAME, QA_MODEL_SNAPSHOT_DIR)
+        if not (os.path.isdir(model_path) and os.path.isdir(embedding_path)):
+            progress("Downloading models and saving a local snapshot")
+            model_path, embedding_path = snapshot_qa_models()
         
         # Initialize the embedding model
-        embedding_function = SentenceTransformerEmbeddings(model_name="thenlper/gte-small")
-        
-        # Load the saved FAISS index with safe loading enabled
-        vectorstore = FAISS.load_local(
-            "INVSTMT_DB", 
-            embedding_function,
-            allow_dangerous_deserialization=True
-        )
+        progress("Loading embedding model")
+        embedding_function = SentenceTransformerEmbeddings(model_name=embedding_path)
         
-        # Initialize a smaller, efficient model for text generation
-        model_name = "facebook/bart-large-cnn"  # Can also use "google/flan-t5-small" for an even smaller model
+        # Load every configured FAISS index shard with safe loading enabled
+        progress("Loading search indexes")
+        shards = load_index_shards(QA_INDEX_SHARDS, embedding_function)
+        if not shards:
+            raise FileNotFoundError(f"None of the index shards exist: {', '.join(QA_INDEX_SHARDS)}")
         
         # Check if CUDA (GPU) is available
         device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"Using device: {device}")
         
-        # Load tokenizer and model
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        # Load tokenizer and model from the snapshot without touching the network
+        progress("Loading language model")
+        tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        model = AutoModelForSeq2SeqLM.from_pretrained(
+            model_path,
+            local_files_only=True,
+            use_safetensors=True,
+            low_cpu_mem_usage=True
+        )
         model.to(device)
         
         # Create text generation pipeline
@@ -89,21 +255,64 @@ def initialize_qa_bot():
         qa_chain = RetrievalQA.from_chain_type(
             llm=llm,
             chain_type="stuff",
-            retriever=vectorstore.as_retriever(search_kwargs={"k": 3}),
+            retriever=ShardedRetriever(shards=shards, k=3),
             return_source_documents=True,
             chain_type_kwargs={"prompt": PROMPT}
         )
         
+        progress("Ready")
         return qa_chain
     
     except Exception as e:
         print(f"\nError initializing QA bot: {str(e)}")
         print("\nPlease ensure:")
-        print("1. The INVSTMT_DB directory exists in the current working directory")
+        print(f"1. The index directories ({', '.join(QA_INDEX_SHARDS)}) exist in the current working directory")
         print("2. All required packages are installed:")
         print("   pip install langchain-community langchain transformers torch sentencepiece")
+        print(f"3. The models can be downloaded once, or are already in {QA_MODEL_SNAPSHOT_DIR}/")
         return None
 
+
+class QAWarmup:
+    """
+    Loads the QA system on a background thread so the calculators never wait for it.
+
+    `status` describes the current loading step and `ready` becomes true once loading has finished,
+    successfully or not; `wait()` blocks until then and returns the QA chain (None on failure).
+    """
+
+    def __init__(self):
+        self.status = "Not started"
+        self.qa_chain = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="qa-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.qa_chain = initialize_qa_bot(progress=self._set_status)
+        finally:
+            if self.qa_chain is None:
+                self.status = "Failed to load, see the server log"
+            self._done.set()
+
+    def _set_status(self, status):
+        print(f"QA warm-up: {status}")
+        self.status = status
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.qa_chain
+
 def get_answer(qa_chain, question: str):
     """
     Get answer for a question using the QA chain
@@ -121,7 +330,7 @@ def get_answer(qa_chain, question: str):
         # Format source information
         sources = []
         for doc in source_docs:
-            sources.append(f"- {doc.metadata['qa_pair']} from {doc.metadata['filename']}")
+            sources.append(f"- {doc.metadata.get('qa_pair', 'Passage')} from {doc.metadata.get('filename', doc.metadata.get('source', 'unknown'))} ({doc.metadata.get('shard', 'index')})")
         
         # Combine answer with sources
         response = f"""
@@ -137,10 +346,109 @@ Sources:
 
     
 
+CURRENCY_DISPLAY_FORMAT = '₹{:,.2f}'
+PERCENT_DISPLAY_FORMAT = '{:,.2f}%'
+
+
+class Schedule:
+    """
+    Column-oriented schedule shared by the calculators, tables, charts and Excel exports.
+
+    Each column is a typed NumPy array, so converting to a DataFrame, a plotly trace or Excel
+    columns never copies row by row. `labels` maps column names to display headers, `kinds` marks
+    'currency' and 'percent' columns for formatting, and `meta` holds scalar results such as the
+    break-even month. Columns may be 2-D (one row per scenario) for batched calculations; use
+    `row()` to pick one scenario before converting it.
+    """
+
+    def __init__(self, columns, labels=None, kinds=None, meta=None):
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        self.labels = dict(labels or {})
+        self.kinds = dict(kinds or {})
+        self.meta = dict(meta or {})
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return next(iter(self.columns.values())).shape[-1]
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def label(self, name):
+        return self.labels.get(name, name)
+
+    def row(self, index):
+        """Return the schedule of one scenario from a batched (2-D) schedule."""
+        return Schedule(
+            {name: values[index] for name, values in self.columns.items()},
+            self.labels,
+            self.kinds,
+            {key: value[index] if np.ndim(value) > 0 else value for key, value in self.meta.items()}
+        )
+
+    def to_frame(self, names=None):
+        """Wrap the columns in a DataFrame with display headers, without copying them."""
+        names = names or list(self.columns)
+        return pd.DataFrame({self.label(name): self.columns[name] for name in names}, copy=False)
+
+    def display_formats(self, names=None):
+        """Styler.format mapping for the currency and percent columns."""
+        names = names or list(self.columns)
+        formats = {'currency': CURRENCY_DISPLAY_FORMAT, 'percent': PERCENT_DISPLAY_FORMAT}
+        return {self.label(name): formats[self.kinds[name]] for name in names if self.kinds.get(name) in formats}
+
+    def to_styler(self, names=None):
+        return self.to_frame(names).style.format(self.display_formats(names))
+
+    def to_trace(self, x, y, **kwargs):
+        """Build a plotly line trace from two columns."""
+        kwargs.setdefault('name', self.label(y))
+        return go.Scatter(x=self.columns[x], y=self.columns[y], mode='lines', **kwargs)
+
+    def write_xlsx(self, worksheet, names=None, start_row=0, header_format=None, column_formats=None):
+        """
+        Write a header row and then each column with a single write_column call.
+
+        Parameters:
+        worksheet: xlsxwriter worksheet to write into
+        names (list, optional): Columns to write, all by default
+        start_row (int): Row of the header
+        header_format: xlsxwriter format for the header row
+        column_formats (dict, optional): xlsxwriter format per column kind or column name
+
+        Returns:
+        int: The first row after the written data
+        """
+        names = names or list(self.columns)
+        column_formats = column_formats or {}
+        worksheet.write_row(start_row, 0, [self.label(name) for name in names], header_format)
+        for col_num, name in enumerate(names):
+            cell_format = column_formats.get(name, column_formats.get(self.kinds.get(name)))
+            worksheet.write_column(start_row + 1, col_num, self.columns[name].tolist(), cell_format)
+        return start_row + 1 + len(self)
+
+
+def _annuity_factor(monthly_rate, months):
+    """
+    Annuity-due factor g + g**2 + ... + g**months with g = 1 + monthly_rate.
+
+    Works element-wise on arrays and falls back to `months` where the rate is zero.
+    """
+    monthly_rate = np.asarray(monthly_rate, dtype=float)
+    months = np.asarray(months, dtype=float)
+    growth = (1 + monthly_rate) ** months
+    safe_rate = np.where(monthly_rate == 0, 1.0, monthly_rate)
+    return np.where(monthly_rate == 0, months, (1 + monthly_rate) * (growth - 1) / safe_rate)
+
+
 def calculate_sip(monthly_contribution, annual_return_rate, investment_years):
     monthly_return_rate = annual_return_rate / 12
     total_months = investment_years * 12
-    future_value = monthly_contribution * (((1 + monthly_return_rate) ** total_months - 1) / monthly_return_rate) * (1 + monthly_return_rate)
+    future_value = monthly_contribution * _annuity_factor(monthly_return_rate, total_months)
     total_invested = monthly_contribution * total_months
     investment_history = []  # Populate as needed
     contribution_history = []  # Populate as needed
@@ -148,6 +456,305 @@ def calculate_sip(monthly_contribution, annual_return_rate, investment_years):
     return future_value, total_invested, investment_history, contribution_history
 
 
+def _growth_basis(monthly_rate, start_month, end_month):
+    """
+    Build the per-unit growth columns for months start_month+1 .. end_month.
+
+    Every schedule in this module is a linear combination of two columns that depend only on the
+    monthly rate: the growth factor g**m and the annuity-due factor g + g**2 + ... + g**m.
+
+    Parameters:
+    monthly_rate (float): Monthly return rate (e.g. 0.01 for 1% a month)
+    start_month (int): Number of months already covered by an existing basis
+    end_month (int): Last month to include
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Growth factors and annuity-due factors
+    """
+    months = np.arange(start_month + 1, end_month + 1, dtype=float)
+    return (1 + monthly_rate) ** months, _annuity_factor(monthly_rate, months)
+
+
+def _reuse_growth_basis(previous, monthly_rate, total_months):
+    """
+    Return the growth basis for total_months, extending or truncating the previous one when the
+    rate is unchanged and computing it from scratch otherwise.
+    """
+    if previous is None or previous.meta.get('monthly_rate') != monthly_rate or 'growth' not in previous.meta:
+        return _growth_basis(monthly_rate, 0, total_months)
+
+    growth, annuity = previous.meta['growth'], previous.meta['annuity']
+    computed_months = len(growth)
+    if total_months <= computed_months:
+        return growth[:total_months], annuity[:total_months]
+
+    extra_growth, extra_annuity = _growth_basis(monthly_rate, computed_months, total_months)
+    return np.concatenate([growth, extra_growth]), np.concatenate([annuity, extra_annuity])
+
+
+SIP_SCHEDULE_LABELS = {
+    'month': 'Month',
+    'year': 'Year',
+    'invested': 'Invested Amount',
+    'value': 'Current Value',
+    'returns': 'Returns',
+    'returns_pct': 'Returns %',
+}
+
+STEP_UP_SIP_SCHEDULE_LABELS = {
+    **SIP_SCHEDULE_LABELS,
+    'contribution': 'Monthly Contribution',
+    'real_value': "Value in Today's Money",
+}
+
+SWP_SCHEDULE_LABELS = {
+    'month': 'Month',
+    'withdrawal': 'Withdrawal (before tax)',
+    'after_tax_withdrawal': 'Withdrawal (after tax)',
+    'tax_paid': 'Tax Paid',
+    'balance': 'Remaining Balance',
+}
+
+
+def calculate_sip_schedule(monthly_contribution, monthly_rate, total_months, previous=None):
+    """
+    Calculate the month-by-month SIP schedule (contribution at the start of each month).
+
+    Pass the schedule returned by the previous call as `previous` to avoid recomputing it: a change
+    of horizon extends or truncates the cached growth columns, a change of contribution only
+    rescales them, and only a change of rate triggers a full recomputation.
+
+    Parameters:
+    monthly_contribution (float): The amount invested each month
+    monthly_rate (float): Monthly return rate (e.g. 0.01 for 1% a month)
+    total_months (int): Number of months to schedule
+    previous (Schedule, optional): Schedule returned by an earlier call
+
+    Returns:
+    Schedule: Monthly invested amount, value and returns, with the break-even month in meta
+    """
+    total_months = max(int(total_months), 0)
+    if (previous is not None
+            and previous.meta.get('monthly_rate') == monthly_rate
+            and previous.meta.get('monthly_contribution') == monthly_contribution
+            and len(previous) == total_months):
+        return previous
+
+    growth, annuity = _reuse_growth_basis(previous, monthly_rate, total_months)
+    month = np.arange(1, total_months + 1, dtype=np.int32)
+    invested = monthly_contribution * month.astype(float)
+    value = monthly_contribution * annuity
+    returns = value - invested
+
+    # Break-even is the first month in which returns become positive
+    positive_months = np.flatnonzero(returns > 0)
+    return Schedule(
+        {
+            'month': month,
+            'year': (month - 1) // 12 + 1,
+            'invested': invested,
+            'value': value,
+            'returns': returns,
+            'returns_pct': np.divide(returns * 100, invested, out=np.zeros_like(returns), where=invested > 0),
+        },
+        labels=SIP_SCHEDULE_LABELS,
+        kinds={'invested': 'currency', 'value': 'currency', 'returns': 'currency', 'returns_pct': 'percent'},
+        meta={
+            'monthly_rate': monthly_rate,
+            'monthly_contribution': monthly_contribution,
+            'growth': growth,
+            'annuity': annuity,
+            'breakeven_month': int(positive_months[0]) + 1 if positive_months.size else None,
+        }
+    )
+
+
+def calculate_swp_schedule(initial_investment, monthly_withdrawal, tax_rate, total_months, monthly_rate=0.01, previous=None):
+    """
+    Calculate the month-by-month SWP schedule (withdrawal at the start of each month, then growth).
+
+    Like calculate_sip_schedule, the previous schedule can be passed back in so that changes to the
+    horizon, investment, withdrawal or tax rate reuse the cached growth columns.
+
+    Parameters:
+    initial_investment (float): Corpus at the start of the withdrawal phase
+    monthly_withdrawal (float): Pre-tax amount withdrawn each month
+    tax_rate (float): Tax rate on withdrawals as a percentage
+    total_months (int): Number of months to schedule
+    monthly_rate (float): Monthly return rate on the remaining balance
+    previous (Schedule, optional): Schedule returned by an earlier call
+
+    Returns:
+    Schedule: Monthly withdrawals before and after tax, tax paid and remaining balance
+    """
+    total_months = max(int(total_months), 0)
+    growth, annuity = _reuse_growth_basis(previous, monthly_rate, total_months)
+    withdrawal = np.full(total_months, float(monthly_withdrawal))
+    after_tax_withdrawal = withdrawal * (1 - tax_rate / 100)
+    return Schedule(
+        {
+            'month': np.arange(1, total_months + 1, dtype=np.int32),
+            'withdrawal': withdrawal,
+            'after_tax_withdrawal': after_tax_withdrawal,
+            'tax_paid': withdrawal - after_tax_withdrawal,
+            'balance': initial_investment * growth - monthly_withdrawal * annuity,
+        },
+        labels=SWP_SCHEDULE_LABELS,
+        kinds={'withdrawal': 'currency', 'after_tax_withdrawal': 'currency', 'tax_paid': 'currency', 'balance': 'currency'},
+        meta={'monthly_rate': monthly_rate, 'growth': growth, 'annuity': annuity}
+    )
+
+
+def calculate_step_up_sip_schedule(monthly_contribution, monthly_rate, total_months, step_up_rate=0.0, step_up_amount=0.0,
+                                   paused_months=(), top_ups=None, annual_inflation_rate=0.0):
+    """
+    Calculate a SIP schedule whose contribution steps up every year.
+
+    The contribution for year k (counting from 0) is monthly_contribution * (1 + step_up_rate)**k
+    + step_up_amount * k. Paused months contribute nothing and top-ups are added on top of the
+    regular contribution. The balance is solved with prefix products instead of a monthly loop,
+    and the value is also reported in today's money using the inflation rate.
+
+    Parameters:
+    monthly_contribution (float): Monthly contribution in the first year
+    monthly_rate (float): Monthly return rate (e.g. 0.01 for 1% a month)
+    total_months (int): Number of months to schedule
+    step_up_rate (float): Yearly percentage increase as a fraction (e.g. 0.10 for 10%)
+    step_up_amount (float): Fixed yearly increase of the monthly contribution
+    paused_months (iterable of int): Month numbers (1-based) in which no contribution is made
+    top_ups (dict, optional): Lump sums to add, keyed by month number (1-based)
+    annual_inflation_rate (float): Annual inflation used for the real value (e.g. 0.06 for 6%)
+
+    Returns:
+    Schedule: Monthly contribution, invested amount, nominal and real value and returns
+    """
+    total_months = max(int(total_months), 0)
+    month = np.arange(1, total_months + 1, dtype=np.int32)
+    year_index = (month - 1) // 12
+
+    contribution = monthly_contribution * (1 + step_up_rate) ** year_index + step_up_amount * year_index
+    paused = np.asarray([m for m in paused_months if 1 <= m <= total_months], dtype=int)
+    contribution[paused - 1] = 0.0
+    if top_ups:
+        top_up_months = np.asarray([m for m in top_ups if 1 <= m <= total_months], dtype=int)
+        np.add.at(contribution, top_up_months - 1, [top_ups[m] for m in top_up_months])
+
+    invested = np.cumsum(contribution)
+    value = _linear_recurrence(0.0, np.full(total_months, 1 + monthly_rate), contribution)
+    returns = value - invested
+
+    positive_months = np.flatnonzero(returns > 0)
+    return Schedule(
+        {
+            'month': month,
+            'year': year_index + 1,
+            'contribution': contribution,
+            'invested': invested,
+            'value': value,
+            'real_value': value / (1 + annual_inflation_rate) ** (month / 12),
+            'returns': returns,
+            'returns_pct': np.divide(returns * 100, invested, out=np.zeros_like(returns), where=invested > 0),
+        },
+        labels=STEP_UP_SIP_SCHEDULE_LABELS,
+        kinds={'contribution': 'currency', 'invested': 'currency', 'value': 'currency', 'real_value': 'currency',
+               'returns': 'currency', 'returns_pct': 'percent'},
+        meta={
+            'monthly_rate': monthly_rate,
+            'annual_inflation_rate': annual_inflation_rate,
+            'breakeven_month': int(positive_months[0]) + 1 if positive_months.size else None,
+        }
+    )
+
+
+def calculate_tax_lot_swp_schedule(sip_schedule, monthly_withdrawal, total_months, monthly_rate=0.01,
+                                   short_term_tax_rate=20.0, long_term_tax_rate=12.5, holding_period_months=12):
+    """
+    Calculate an SWP schedule that redeems the SIP installments FIFO and taxes only the gains.
+
+    Each SIP contribution is a lot bought at the start of its month at a NAV that grows with the
+    SIP's monthly rate. Withdrawals then sell units at a NAV growing with `monthly_rate`, oldest lots
+    first. Because FIFO consumes lots in order, the cost of the first u units redeemed is a
+    piecewise-linear function of u over the cumulative units and costs of the lots, so every
+    withdrawal's cost basis is found with a binary search rather than by rescanning the lots. Units
+    from lots held for more than `holding_period_months` are long-term.
+
+    Parameters:
+    sip_schedule (Schedule): SIP schedule whose contributions are the purchase lots
+    monthly_withdrawal (float): Pre-tax amount withdrawn each month
+    total_months (int): Number of months of withdrawals
+    monthly_rate (float): Monthly return during the withdrawal phase
+    short_term_tax_rate (float): Tax rate on short-term gains as a percentage
+    long_term_tax_rate (float): Tax rate on long-term gains as a percentage
+    holding_period_months (int): Holding period after which a lot is long-term
+
+    Returns:
+    Schedule: Monthly withdrawals, cost basis, short and long-term gains, tax and remaining balance
+    """
+    total_months = max(int(total_months), 0)
+    sip_rate = sip_schedule.meta['monthly_rate']
+    if 'contribution' in sip_schedule:
+        lot_amounts = sip_schedule['contribution']
+    else:
+        lot_amounts = np.diff(sip_schedule['invested'], prepend=0.0)
+    sip_months = len(lot_amounts)
+
+    # Lots bought at the start of month m at NAV (1 + sip_rate)**(m - 1), with NAV 1 at the start
+    lot_months = np.arange(1, sip_months + 1)
+    lot_units = lot_amounts / (1 + sip_rate) ** (lot_months - 1)
+    cumulative_units = np.concatenate([[0.0], np.cumsum(lot_units)])
+    cumulative_cost = np.concatenate([[0.0], np.cumsum(lot_amounts)])
+    total_units = cumulative_units[-1]
+
+    # Withdrawals happen at the start of each month after the SIP ends
+    month = np.arange(1, total_months + 1, dtype=np.int32)
+    sale_months = sip_months + month
+    nav = (1 + sip_rate) ** sip_months * (1 + monthly_rate) ** (month - 1)
+
+    # Units redeemed so far, capped at the units held once the corpus runs out
+    redeemed_after = np.minimum(np.cumsum(monthly_withdrawal / nav), total_units)
+    redeemed_before = np.concatenate([[0.0], redeemed_after[:-1]])
+    withdrawal = (redeemed_after - redeemed_before) * nav
+
+    # Units up to the boundary came from lots bought more than the holding period ago
+    long_term_lots = np.searchsorted(lot_months, sale_months - holding_period_months, side='left')
+    boundary = np.clip(cumulative_units[long_term_lots], redeemed_before, redeemed_after)
+
+    def cost_of(units):
+        return np.interp(units, cumulative_units, cumulative_cost)
+
+    long_term_cost = cost_of(boundary) - cost_of(redeemed_before)
+    short_term_cost = cost_of(redeemed_after) - cost_of(boundary)
+    long_term_gain = (boundary - redeemed_before) * nav - long_term_cost
+    short_term_gain = (redeemed_after - boundary) * nav - short_term_cost
+    tax_paid = (np.maximum(short_term_gain, 0) * short_term_tax_rate + np.maximum(long_term_gain, 0) * long_term_tax_rate) / 100
+
+    return Schedule(
+        {
+            'month': month,
+            'withdrawal': withdrawal,
+            'cost_basis': long_term_cost + short_term_cost,
+            'short_term_gain': short_term_gain,
+            'long_term_gain': long_term_gain,
+            'tax_paid': tax_paid,
+            'after_tax_withdrawal': withdrawal - tax_paid,
+            'balance': (total_units - redeemed_after) * nav * (1 + monthly_rate),
+        },
+        labels={
+            **SWP_SCHEDULE_LABELS,
+            'cost_basis': 'Cost of Units Redeemed',
+            'short_term_gain': 'Short-term Gain',
+            'long_term_gain': 'Long-term Gain',
+        },
+        kinds={name: 'currency' for name in ['withdrawal', 'cost_basis', 'short_term_gain', 'long_term_gain',
+                                              'tax_paid', 'after_tax_withdrawal', 'balance']},
+        meta={
+            'monthly_rate': monthly_rate,
+            'initial_investment': total_units * (1 + sip_rate) ** sip_months,
+            'depletion_month': int(np.argmax(redeemed_after >= total_units)) + 1 if total_months and redeemed_after[-1] >= total_units else 0,
+        }
+    )
+
+
 def calculate_break_even(monthly_investment, expected_return):
     """
     Calculates the time in months and years required to break even on a monthly investment
@@ -160,6 +767,9 @@ def calculate_break_even(monthly_investment, expected_return):
     Returns:
     Tuple[int, int]: The time to break even in years and remaining months
     """
+    # Without a positive return the value never exceeds the amount invested
+    if expected_return <= 0:
+        raise ValueError("A SIP only breaks even with a positive expected return")
     months = 0
     while True:
         total_invested = monthly_investment * months
@@ -172,14 +782,18 @@ def calculate_break_even(monthly_investment, expected_return):
     return years, remaining_months
 
 
-def create_investment_growth_report(monthly_investment, annual_return_rate, investment_duration_years):
+def create_investment_growth_report(monthly_investment, annual_return_rate, investment_duration_years,
+                                    step_up_rate=0.0, step_up_amount=0.0, annual_inflation_rate=0.0):
     """
     Create an Excel report for investment growth with a custom monthly and yearly breakdown.
 
     Parameters:
-    monthly_investment (float): Monthly investment amount.
+    monthly_investment (float): Monthly investment amount (in the first year for a step-up SIP).
     annual_return_rate (float): Expected annual return rate as a percentage.
     investment_duration_years (int): Investment duration in years.
+    step_up_rate (float): Yearly increase of the monthly investment as a percentage.
+    step_up_amount (float): Fixed yearly increase of the monthly investment.
+    annual_inflation_rate (float): Annual inflation as a percentage, for the real balance column.
 
     Returns:
     bytes: Excel file content as bytes.
@@ -190,55 +804,56 @@ def create_investment_growth_report(monthly_investment, annual_return_rate, inve
     total_months = investment_duration_years * 12
     monthly_rate = (annual_return_rate / 12) / 100
 
-    # Initialize investment report data
-    investment_data = []
-    monthly_balance = 0
-    yearly_balance = 0
-    year = 1
-
-    # Calculate monthly and yearly balances
-    for month in range(1, total_months + 1):
-        monthly_balance += monthly_investment
-        monthly_balance *= (1 + monthly_rate)
-
-        # Accumulate yearly balance at the end of each year
-        if month % 12 == 0:
-            yearly_balance = monthly_balance
-            year += 1
-
-        # Append data for each month
-        investment_data.append({
-            'Month': month,
-            'Monthly Balance': round(monthly_balance, 2),
-            'Year': year if month % 12 != 0 else year - 1,
-            'Yearly Balance': round(yearly_balance, 2) if month % 12 == 0 else '',
-            'Monthly Investment': monthly_investment,
-            'Expected Annual Return': annual_return_rate,
-            'Investment Duration (Years)': investment_duration_years
-        })
+    # Calculate monthly balances; the yearly balance is only filled in at each year end
+    schedule = calculate_step_up_sip_schedule(
+        monthly_investment, monthly_rate, total_months,
+        step_up_rate=step_up_rate / 100,
+        step_up_amount=step_up_amount,
+        annual_inflation_rate=annual_inflation_rate / 100
+    )
+    monthly_balance = np.round(schedule['value'], 2)
+    year_end = schedule['month'] % 12 == 0
+    yearly_balance = monthly_balance.astype(object)
+    yearly_balance[~year_end] = ''
 
-    # Create DataFrame for investment data
-    investment_df = pd.DataFrame(investment_data)
+    report = Schedule(
+        {
+            'month': schedule['month'],
+            'monthly_balance': monthly_balance,
+            'year': schedule['year'],
+            'yearly_balance': yearly_balance,
+            'real_balance': np.round(schedule['real_value'], 2),
+            'monthly_investment': schedule['contribution'],
+            'annual_return_rate': np.full(total_months, annual_return_rate),
+            'investment_duration_years': np.full(total_months, investment_duration_years),
+        },
+        labels={
+            'month': 'Month',
+            'monthly_balance': 'Monthly Balance',
+            'year': 'Year',
+            'yearly_balance': 'Yearly Balance',
+            'real_balance': "Balance in Today's Money",
+            'monthly_investment': 'Monthly Investment',
+            'annual_return_rate': 'Expected Annual Return',
+            'investment_duration_years': 'Investment Duration (Years)',
+        }
+    )
 
     # Write to Excel with formatting
     with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-        investment_df.to_excel(writer, sheet_name='Investment Report', index=False)
-        
         # Format worksheet
         workbook = writer.book
-        worksheet = writer.sheets['Investment Report']
+        worksheet = workbook.add_worksheet('Investment Report')
         
         # Apply formatting for readability
         header_format = workbook.add_format({'bold': True, 'bg_color': '#f0f0f0', 'font_size': 12})
         currency_format = workbook.add_format({'num_format': '₹#,##0.00'})
 
-        # Set column widths and apply header formatting
-        for col_num, value in enumerate(investment_df.columns):
-            worksheet.write(0, col_num, value, header_format)
+        report.write_xlsx(worksheet, header_format=header_format)
 
         # Apply currency formatting to balance columns
         worksheet.set_column('B:B', 15, currency_format)
-        worksheet.set_column('D:D', 15, currency_format)
+        worksheet.set_column('D:F', 15, currency_format)
 
     # Return the Excel file as bytes
     excel_buffer.seek(0)
@@ -286,33 +901,832 @@ def create_swp_report(initial_investment, monthly_withdrawal, tax_rate, withdraw
     return excel_buffer.getvalue()
 
 def calculate_swp(initial_investment, monthly_withdrawal, tax_rate, withdraw_years):
-    months = withdraw_years * 12
-    monthly_balances = []
-    total_withdrawal_history = []  # This will store pre-tax withdrawal amounts
-    after_tax_withdrawal_history = []  # This will store after-tax withdrawal amounts
-    current_balance = initial_investment
-    
-    for month in range(months):
-        # Calculate the tax on the monthly withdrawal
-        tax = (monthly_withdrawal * tax_rate) / 100
-        after_tax_withdrawal = monthly_withdrawal - tax  # Subtract tax instead of adding
+    schedule = calculate_swp_schedule(initial_investment, monthly_withdrawal, tax_rate, withdraw_years * 12)
+    monthly_balances = schedule['balance'].tolist()
+    after_tax_withdrawal_history = schedule['after_tax_withdrawal'].tolist()
+
+    total_withdrawals = float(schedule['withdrawal'].sum())  # Total pre-tax withdrawals
+    after_tax_withdrawals = float(schedule['after_tax_withdrawal'].sum())  # Total after-tax withdrawals
+    remaining_balance = monthly_balances[-1] if monthly_balances else initial_investment
+
+    return total_withdrawals, after_tax_withdrawals, remaining_balance, monthly_balances, after_tax_withdrawal_history
+
+def _swp_remaining_balance(initial_investment, monthly_withdrawal, monthly_rate, months):
+    """Closed-form balance left after `months` withdrawals, element-wise over arrays."""
+    growth = (1 + np.asarray(monthly_rate, dtype=float)) ** np.asarray(months, dtype=float)
+    return initial_investment * growth - monthly_withdrawal * _annuity_factor(monthly_rate, months)
+
+
+def _bisect(func, target, low, high, tol=1e-10, max_iter=200):
+    """
+    Vectorized bisection: solve func(x) == target element-wise for x in [low, high].
+
+    `func` must accept an array of candidates and return values broadcastable against `target`.
+    Elements whose bracket does not contain a solution come back as NaN.
+    """
+    target = np.asarray(target, dtype=float)
+    low = np.broadcast_to(np.asarray(low, dtype=float), target.shape).copy()
+    high = np.broadcast_to(np.asarray(high, dtype=float), target.shape).copy()
+
+    f_low = func(low) - target
+    f_high = func(high) - target
+    bracketed = np.sign(f_low) * np.sign(f_high) <= 0
+
+    for _ in range(max_iter):
+        mid = (low + high) / 2
+        f_mid = func(mid) - target
+        same_side = np.sign(f_mid) == np.sign(f_low)
+        low = np.where(same_side, mid, low)
+        f_low = np.where(same_side, f_mid, f_low)
+        high = np.where(same_side, high, mid)
+        if np.all(high - low < tol):
+            break
+
+    result = np.where(bracketed, (low + high) / 2, np.nan)
+    return result[()]
+
+
+def solve_sip_contribution(target_value, annual_return_rate, investment_years):
+    """
+    Monthly contribution needed to reach a target corpus (closed form, inverse of calculate_sip).
+
+    All arguments may be arrays to solve many goals at once.
+
+    Parameters:
+    target_value (float or array): Target corpus
+    annual_return_rate (float or array): Expected annual return rate (e.g. 0.12 for 12%)
+    investment_years (float or array): Investment duration in years
+
+    Returns:
+    float or np.ndarray: Required monthly contribution
+    """
+    unit_value = calculate_sip(1.0, np.asarray(annual_return_rate, dtype=float), np.asarray(investment_years, dtype=float))[0]
+    return (np.asarray(target_value, dtype=float) / unit_value)[()]
+
+
+def solve_sip_rate(target_value, monthly_contribution, investment_years, low=-0.99, high=1.0):
+    """
+    Annual return rate needed for a monthly contribution to reach a target corpus.
+
+    Solved by bracketed bisection on calculate_sip; goals that cannot be reached with a rate in
+    [low, high] come back as NaN.
+
+    Parameters:
+    target_value (float or array): Target corpus
+    monthly_contribution (float or array): The amount invested each month
+    investment_years (float or array): Investment duration in years
+    low (float): Lowest annual rate to consider
+    high (float): Highest annual rate to consider
+
+    Returns:
+    float or np.ndarray: Required annual return rate (e.g. 0.12 for 12%)
+    """
+    target_value, monthly_contribution, investment_years = np.broadcast_arrays(
+        np.asarray(target_value, dtype=float),
+        np.asarray(monthly_contribution, dtype=float),
+        np.asarray(investment_years, dtype=float)
+    )
+    return _bisect(
+        lambda rate: calculate_sip(monthly_contribution, rate, investment_years)[0],
+        target_value, low, high
+    )
+
+
+def solve_sip_months(target_value, monthly_contribution, annual_return_rate):
+    """
+    Number of monthly contributions needed to reach a target corpus (closed form).
+
+    Parameters:
+    target_value (float or array): Target corpus
+    monthly_contribution (float or array): The amount invested each month
+    annual_return_rate (float or array): Expected annual return rate (e.g. 0.12 for 12%)
+
+    Returns:
+    float or np.ndarray: Months needed, rounded up (NaN if the target is never reached)
+    """
+    target_value = np.asarray(target_value, dtype=float)
+    monthly_contribution = np.asarray(monthly_contribution, dtype=float)
+    monthly_rate = np.asarray(annual_return_rate, dtype=float) / 12
+
+    units = target_value / monthly_contribution
+    safe_rate = np.where(monthly_rate == 0, 1.0, monthly_rate)
+    growth_needed = 1 + units * safe_rate / (1 + safe_rate)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        months = np.where(
+            monthly_rate == 0,
+            units,
+            np.log(np.where(growth_needed > 0, growth_needed, np.nan)) / np.log1p(safe_rate)
+        )
+    # Guard against 0.9999... rounding up to an extra month
+    return np.ceil(np.round(months, 9))[()]
+
+
+def solve_swp_withdrawal(initial_investment, withdraw_years, annual_return_rate=0.12, remaining_balance=0.0):
+    """
+    Maximum monthly withdrawal that a corpus sustains for the given duration (closed form).
+
+    Parameters:
+    initial_investment (float or array): Corpus at the start of the withdrawal phase
+    withdraw_years (float or array): Withdrawal duration in years
+    annual_return_rate (float or array): Annual return on the remaining balance (calculate_swp uses 12%)
+    remaining_balance (float or array): Balance that must be left at the end
+
+    Returns:
+    float or np.ndarray: Maximum pre-tax monthly withdrawal
+    """
+    initial_investment = np.asarray(initial_investment, dtype=float)
+    monthly_rate = np.asarray(annual_return_rate, dtype=float) / 12
+    months = np.asarray(withdraw_years, dtype=float) * 12
+    growth = (1 + monthly_rate) ** months
+    return ((initial_investment * growth - remaining_balance) / _annuity_factor(monthly_rate, months))[()]
+
+
+def solve_swp_initial_investment(monthly_withdrawal, withdraw_years, annual_return_rate=0.12, remaining_balance=0.0):
+    """
+    Corpus needed to fund a monthly withdrawal for the given duration (closed form).
+
+    Parameters:
+    monthly_withdrawal (float or array): Pre-tax amount withdrawn each month
+    withdraw_years (float or array): Withdrawal duration in years
+    annual_return_rate (float or array): Annual return on the remaining balance
+    remaining_balance (float or array): Balance that must be left at the end
+
+    Returns:
+    float or np.ndarray: Required initial investment
+    """
+    monthly_withdrawal = np.asarray(monthly_withdrawal, dtype=float)
+    monthly_rate = np.asarray(annual_return_rate, dtype=float) / 12
+    months = np.asarray(withdraw_years, dtype=float) * 12
+    growth = (1 + monthly_rate) ** months
+    return ((remaining_balance + monthly_withdrawal * _annuity_factor(monthly_rate, months)) / growth)[()]
+
+
+def solve_swp_rate(initial_investment, monthly_withdrawal, withdraw_years, remaining_balance=0.0, low=-0.99, high=1.0):
+    """
+    Annual return rate at which a corpus exactly funds the withdrawals for the given duration.
+
+    Solved by bracketed bisection; combinations with no rate in [low, high] come back as NaN.
+
+    Parameters:
+    initial_investment (float or array): Corpus at the start of the withdrawal phase
+    monthly_withdrawal (float or array): Pre-tax amount withdrawn each month
+    withdraw_years (float or array): Withdrawal duration in years
+    remaining_balance (float or array): Balance that must be left at the end
+    low (float): Lowest annual rate to consider
+    high (float): Highest annual rate to consider
+
+    Returns:
+    float or np.ndarray: Required annual return rate
+    """
+    initial_investment, monthly_withdrawal, months, remaining_balance = np.broadcast_arrays(
+        np.asarray(initial_investment, dtype=float),
+        np.asarray(monthly_withdrawal, dtype=float),
+        np.asarray(withdraw_years, dtype=float) * 12,
+        np.asarray(remaining_balance, dtype=float)
+    )
+    return _bisect(
+        lambda rate: _swp_remaining_balance(initial_investment, monthly_withdrawal, rate / 12, months),
+        remaining_balance, low, high
+    )
+
+
+def solve_swp_months(initial_investment, monthly_withdrawal, annual_return_rate=0.12):
+    """
+    Number of full monthly withdrawals a corpus can fund before it runs out (closed form).
+
+    Parameters:
+    initial_investment (float or array): Corpus at the start of the withdrawal phase
+    monthly_withdrawal (float or array): Pre-tax amount withdrawn each month
+    annual_return_rate (float or array): Annual return on the remaining balance
+
+    Returns:
+    float or np.ndarray: Months of withdrawals (inf when the returns alone cover the withdrawal)
+    """
+    initial_investment = np.asarray(initial_investment, dtype=float)
+    monthly_withdrawal = np.asarray(monthly_withdrawal, dtype=float)
+    monthly_rate = np.asarray(annual_return_rate, dtype=float) / 12
+
+    safe_rate = np.where(monthly_rate == 0, 1.0, monthly_rate)
+    # Balance after n months is g**n * (P - w*g/r) + w*g/r, so it reaches zero when
+    # g**n = (w*g/r) / (w*g/r - P); if w*g/r <= P the corpus never runs out
+    perpetuity = monthly_withdrawal * (1 + safe_rate) / safe_rate
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = perpetuity / (perpetuity - initial_investment)
+        months = np.where(
+            monthly_rate == 0,
+            initial_investment / monthly_withdrawal,
+            np.where(ratio > 0, np.log(ratio) / np.log1p(safe_rate), np.inf)
+        )
+    return np.floor(np.round(months, 9))[()]
+
+
+def _linear_recurrence(initial_balance, growth, flows):
+    """
+    Solve balance[m] = growth[m] * (balance[m-1] + flows[m]) along the last axis without a loop.
+
+    With G[m] = growth[0] * ... * growth[m], the balance is G[m] * (initial + sum(flows[k] / G[k-1])),
+    so the whole timeline is a cumulative product and a cumulative sum.
+    """
+    cumulative_growth = np.cumprod(growth, axis=-1)
+    previous_growth = np.concatenate([np.ones_like(cumulative_growth[..., :1]), cumulative_growth[..., :-1]], axis=-1)
+    return cumulative_growth * (np.asarray(initial_balance, dtype=float)[..., None] + np.cumsum(flows / previous_growth, axis=-1))
+
+
+def _stop_at_depletion(balance, withdrawal, initial_balance=0.0):
+    """
+    Stop withdrawals once the balance can no longer fund them, along the last axis.
+
+    The first month whose balance would go negative pays out what was left and every later month
+    withdraws nothing and holds nothing.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray, np.ndarray]: Balance, withdrawal and the 0-based index of the
+    depletion month (-1 if the balance never runs out)
+    """
+    depleted = np.cumsum(balance < 0, axis=-1) > 0
+    # Depletion is permanent, so the first depleted month follows from how many months are depleted
+    depletion_index = np.where(depleted.any(axis=-1), balance.shape[-1] - depleted.sum(axis=-1), -1)
+    balance_before = np.concatenate([np.full_like(balance[..., :1], float(initial_balance)), balance[..., :-1]], axis=-1)
+    first_depleted = depleted & ~np.concatenate([np.zeros_like(depleted[..., :1]), depleted[..., :-1]], axis=-1)
+    withdrawal = np.where(first_depleted, np.maximum(balance_before, 0.0), np.where(depleted, 0.0, withdrawal))
+    return np.where(depleted, 0.0, balance), withdrawal, depletion_index
+
+
+def simulate_lifecycle(current_age, retirement_age, end_age, monthly_contribution, pre_retirement_return,
+                       post_retirement_return, monthly_withdrawal, tax_rate=0.0, gap_years=0, initial_investment=0.0):
+    """
+    Simulate SIP accumulation followed by SWP decumulation as one monthly timeline.
+
+    Contributions run until retirement and grow at the pre-retirement return. After retirement the
+    corpus grows at the post-retirement return, optionally untouched for `gap_years`, and then funds
+    the monthly withdrawal until `end_age` or until it runs out. Passing an array of retirement ages
+    simulates all of them at once; every column then has one row per retirement age.
+
+    Parameters:
+    current_age (int): Age at the first contribution
+    retirement_age (int or array): Age at which contributions stop
+    end_age (int): Age at which the simulation ends
+    monthly_contribution (float): The amount invested each month before retirement
+    pre_retirement_return (float): Expected annual return before retirement (e.g. 0.12 for 12%)
+    post_retirement_return (float): Expected annual return after retirement
+    monthly_withdrawal (float): Pre-tax amount withdrawn each month once withdrawals start
+    tax_rate (float): Tax rate on withdrawals as a percentage
+    gap_years (int): Years between retirement and the first withdrawal
+    initial_investment (float): Corpus already invested at current_age
+
+    Returns:
+    Schedule: Columns 'month', 'age', 'phase', 'contribution', 'withdrawal', 'after_tax_withdrawal' and
+    'balance', with 'retirement_balance' and 'depletion_month' (0 if the corpus never runs out) in meta
+    """
+    retirement_age = np.asarray(retirement_age, dtype=float)
+    total_months = int(round((end_age - current_age) * 12))
+    month = np.arange(1, total_months + 1)
+
+    accumulation_months = np.round((retirement_age - current_age) * 12)[..., None]
+    withdrawal_start = accumulation_months + gap_years * 12
+    is_accumulation = month <= accumulation_months
+    is_withdrawal = month > withdrawal_start
+
+    growth = np.where(is_accumulation, 1 + pre_retirement_return / 12, 1 + post_retirement_return / 12)
+    contribution = np.where(is_accumulation, float(monthly_contribution), 0.0)
+    withdrawal = np.where(is_withdrawal, float(monthly_withdrawal), 0.0)
+    balance = _linear_recurrence(initial_investment, growth, contribution - withdrawal)
+
+    # Once the corpus cannot fund a full withdrawal, pay out what is left and stop
+    balance, withdrawal, depletion_index = _stop_at_depletion(balance, withdrawal, initial_investment)
+
+    # Balance at the end of the last accumulation month (the starting corpus if already retired)
+    month_end_balance = np.concatenate([np.full_like(balance[..., :1], float(initial_investment)), balance], axis=-1)
+    retirement_index = np.clip(accumulation_months.astype(int), 0, total_months)
+    retirement_balance = np.take_along_axis(month_end_balance, retirement_index, axis=-1)[..., 0]
+
+    phase = np.select([is_accumulation, is_withdrawal], ['Accumulation', 'Withdrawal'], 'Gap')
+    return Schedule(
+        {
+            'month': np.broadcast_to(month, balance.shape),
+            'age': np.broadcast_to(current_age + (month - 1) / 12, balance.shape),
+            'phase': np.broadcast_to(phase, balance.shape),
+            'contribution': contribution,
+            'withdrawal': withdrawal,
+            'after_tax_withdrawal': withdrawal * (1 - tax_rate / 100),
+            'balance': balance,
+        },
+        labels={
+            'month': 'Month',
+            'age': 'Age',
+            'phase': 'Phase',
+            'contribution': 'Contribution',
+            'withdrawal': 'Withdrawal (before tax)',
+            'after_tax_withdrawal': 'Withdrawal (after tax)',
+            'balance': 'Balance',
+        },
+        kinds={'contribution': 'currency', 'withdrawal': 'currency', 'after_tax_withdrawal': 'currency', 'balance': 'currency'},
+        meta={'retirement_balance': retirement_balance, 'depletion_month': depletion_index + 1}
+    )
+
+
+def compare_retirement_ages(retirement_ages, current_age, end_age, monthly_contribution, pre_retirement_return,
+                            post_retirement_return, monthly_withdrawal, tax_rate=0.0, gap_years=0, initial_investment=0.0):
+    """
+    Sweep simulate_lifecycle over many retirement ages in one call and summarize each outcome.
+
+    Returns:
+    pd.DataFrame: One row per retirement age with corpus at retirement, withdrawals, final balance
+    and the age at which the corpus runs out (NaN if it lasts until end_age)
+    """
+    retirement_ages = np.atleast_1d(np.asarray(retirement_ages, dtype=float))
+    lifecycle = simulate_lifecycle(
+        current_age, retirement_ages, end_age, monthly_contribution, pre_retirement_return,
+        post_retirement_return, monthly_withdrawal, tax_rate, gap_years, initial_investment
+    )
+    depletion_month = lifecycle.meta['depletion_month']
+    return pd.DataFrame({
+        'Retirement Age': retirement_ages,
+        'Total Invested': lifecycle['contribution'].sum(axis=-1) + initial_investment,
+        'Corpus at Retirement': lifecycle.meta['retirement_balance'],
+        'Total Withdrawals (before tax)': lifecycle['withdrawal'].sum(axis=-1),
+        'Total Withdrawals (after tax)': lifecycle['after_tax_withdrawal'].sum(axis=-1),
+        'Final Balance': lifecycle['balance'][..., -1],
+        'Corpus Runs Out at Age': np.where(depletion_month > 0, current_age + (depletion_month - 1) / 12, np.nan),
+    })
+
+
+def simulate_scenarios(monthly_contribution, annual_return_rate, investment_years, step_up_rate=0.0,
+                       monthly_withdrawal=0.0, withdraw_years=0, withdrawal_return_rate=None, tax_rate=0.0):
+    """
+    Simulate many SIP-then-SWP plans side by side in one batched pass.
+
+    Every parameter is a scalar or an array with one entry per scenario. Each scenario invests a
+    monthly contribution that steps up every year, then withdraws a fixed monthly amount, with the
+    annual rates compounded monthly as in calculate_sip and simulate_lifecycle. All scenarios share one timeline as long as
+    the longest plan; months after a scenario has ended have a NaN balance and no cash flows.
+
+    Parameters:
+    monthly_contribution (float or array): Monthly contribution in the first year
+    annual_return_rate (float or array): Expected annual return while investing (e.g. 0.12 for 12%)
+    investment_years (float or array): Years of contributions
+    step_up_rate (float or array): Yearly increase of the contribution (e.g. 0.10 for 10%)
+    monthly_withdrawal (float or array): Pre-tax amount withdrawn each month after the SIP
+    withdraw_years (float or array): Years of withdrawals
+    withdrawal_return_rate (float or array, optional): Annual return while withdrawing, the SIP's by default
+    tax_rate (float or array): Tax rate on withdrawals as a percentage
+
+    Returns:
+    Schedule: 2-D columns 'month', 'contribution', 'invested', 'withdrawal', 'after_tax_withdrawal' and
+    'balance' (one row per scenario), with 'corpus', 'final_balance', 'depletion_month' (0 if the corpus
+    never runs out) and 'end_month' per scenario in meta
+    """
+    if withdrawal_return_rate is None:
+        withdrawal_return_rate = annual_return_rate
+    (monthly_contribution, annual_return_rate, investment_years, step_up_rate, monthly_withdrawal,
+     withdraw_years, withdrawal_return_rate, tax_rate) = (
+        values[:, None] for values in np.broadcast_arrays(*(
+            np.atleast_1d(np.asarray(values, dtype=float)) for values in (
+                monthly_contribution, annual_return_rate, investment_years, step_up_rate,
+                monthly_withdrawal, withdraw_years, withdrawal_return_rate, tax_rate
+            )
+        ))
+    )
+
+    accumulation_months = np.round(investment_years * 12)
+    end_month = accumulation_months + np.round(withdraw_years * 12)
+    total_months = int(end_month.max())
+    month = np.arange(1, total_months + 1)
+    is_accumulation = month <= accumulation_months
+    is_active = month <= end_month
+    is_withdrawal = is_active & ~is_accumulation
+
+    # Ended scenarios keep their balance: no growth and no flows
+    growth = np.where(is_accumulation, 1 + annual_return_rate / 12, 1 + withdrawal_return_rate / 12)
+    growth = np.where(is_active, growth, 1.0)
+    contribution = np.where(is_accumulation, monthly_contribution * (1 + step_up_rate) ** ((month - 1) // 12), 0.0)
+    withdrawal = np.where(is_withdrawal, monthly_withdrawal, 0.0)
+    balance = _linear_recurrence(np.zeros(len(end_month)), growth, contribution - withdrawal)
+
+    # Once the corpus cannot fund a full withdrawal, pay out what is left and stop
+    balance, withdrawal, depletion_index = _stop_at_depletion(balance, withdrawal)
+
+    # Balances at the end of the SIP and of the whole plan (0 for a plan of no months)
+    month_end_balance = np.concatenate([np.zeros((len(end_month), 1)), balance], axis=-1)
+    corpus = np.take_along_axis(month_end_balance, accumulation_months.astype(int), axis=-1)[:, 0]
+    final_balance = np.take_along_axis(month_end_balance, end_month.astype(int), axis=-1)[:, 0]
+
+    return Schedule(
+        {
+            'month': np.broadcast_to(month, balance.shape),
+            'contribution': contribution,
+            'invested': np.cumsum(contribution, axis=-1),
+            'withdrawal': withdrawal,
+            'after_tax_withdrawal': withdrawal * (1 - tax_rate / 100),
+            'balance': np.where(is_active, balance, np.nan),
+        },
+        labels={
+            'month': 'Month',
+            'contribution': 'Contribution',
+            'invested': 'Invested Amount',
+            'withdrawal': 'Withdrawal (before tax)',
+            'after_tax_withdrawal': 'Withdrawal (after tax)',
+            'balance': 'Balance',
+        },
+        kinds={'contribution': 'currency', 'invested': 'currency', 'withdrawal': 'currency',
+               'after_tax_withdrawal': 'currency', 'balance': 'currency'},
+        meta={
+            'corpus': corpus,
+            'final_balance': final_balance,
+            'depletion_month': depletion_index + 1,
+            'end_month': end_month[:, 0].astype(int),
+        }
+    )
+
+
+def summarize_scenarios(scenarios, names, start_date):
+    """
+    Summarize each scenario of simulate_scenarios, with its after-tax XIRR solved for all at once.
+
+    Returns:
+    pd.DataFrame: One row per scenario with invested amount, corpus at the end of the SIP,
+    withdrawals, final balance, XIRR and the month the corpus runs out (NaN if it lasts)
+    """
+    contribution = scenarios['contribution']
+    after_tax_withdrawal = scenarios['after_tax_withdrawal']
+    end_month = scenarios.meta['end_month']
+    final_balance = scenarios.meta['final_balance']
+    depletion_month = scenarios.meta['depletion_month']
+
+    # Contributions out and withdrawals in at the start of each month, the final balance at the end
+    amounts = np.zeros((len(end_month), contribution.shape[-1] + 1))
+    amounts[:, :-1] = after_tax_withdrawal - contribution
+    amounts[np.arange(len(end_month)), end_month] += final_balance
+    xirr = calculate_xirr(monthly_dates(start_date, amounts.shape[-1]), amounts)
+    # Nothing invested means no return to speak of
+    xirr = np.where(contribution.sum(axis=-1) > 0, xirr, np.nan)
+
+    return pd.DataFrame({
+        'Scenario': list(names),
+        'Total Invested': contribution.sum(axis=-1),
+        'Corpus at End of SIP': scenarios.meta['corpus'],
+        'Total Withdrawals (before tax)': scenarios['withdrawal'].sum(axis=-1),
+        'Total Withdrawals (after tax)': after_tax_withdrawal.sum(axis=-1),
+        'Final Balance': final_balance,
+        'XIRR (%)': xirr * 100,
+        'Corpus Runs Out in Month': np.where(depletion_month > 0, depletion_month, np.nan),
+    })
+
+
+def calculate_xirr(dates, amounts, tol=1e-10, max_iter=100):
+    """
+    Annualized internal rate of return of dated cash flows, batched over many schedules at once.
+
+    Each row of `amounts` is one schedule (negative for money invested, positive for money received);
+    `dates` is either shared by all rows or given per row. Ragged schedules can be padded with NaN
+    amounts. Rows are solved together with a safeguarded Newton iteration: every row keeps a bracket
+    around the root and falls back to bisection whenever a Newton step leaves it, so zero and
+    negative returns converge as reliably as positive ones.
+
+    Parameters:
+    dates (np.ndarray): Cash-flow dates (datetime64), shape (n,) or (schedules, n)
+    amounts (np.ndarray): Cash-flow amounts, shape (n,) or (schedules, n)
+    tol (float): Convergence tolerance on the rate
+    max_iter (int): Maximum number of iterations
+
+    Returns:
+    float or np.ndarray: Annual rate per schedule (e.g. 0.12 for 12%), NaN where no rate exists
+    """
+    amounts = np.nan_to_num(np.asarray(amounts, dtype=float))
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    years = np.broadcast_to((dates - dates[..., :1]).astype(float) / 365.0, amounts.shape)
+
+    nonzero = amounts != 0
+
+    def npv_and_slope(rate):
+        # Zero (padding) amounts are left out, so a far-off discount factor overflowing cannot
+        # turn their 0 * inf into NaN
+        with np.errstate(over='ignore', invalid='ignore'):
+            discount = (1 + rate[..., None]) ** -years
+            present_values = np.where(nonzero, amounts * discount, 0.0)
+            slopes = np.where(nonzero, -years * present_values / (1 + rate[..., None]), 0.0)
+        return present_values.sum(axis=-1), slopes.sum(axis=-1)
+
+    batch_shape = amounts.shape[:-1]
+    # The lowest rate tried keeps (1 + rate) ** -years below e**600 over each row's cash flows
+    horizon = np.where(nonzero, years, 0.0).max(axis=-1, initial=0.0)
+    with np.errstate(divide='ignore'):
+        low = np.asarray(np.maximum(np.expm1(-600.0 / horizon), -0.9999), dtype=float)
+    high = np.full(batch_shape, 1.0)
+    npv_low = npv_and_slope(low)[0]
+    npv_high = npv_and_slope(high)[0]
+
+    # Widen the upper end until the NPV changes sign (or give up on very large rates)
+    for _ in range(20):
+        unbracketed = np.sign(npv_low) == np.sign(npv_high)
+        if not unbracketed.any():
+            break
+        high = np.where(unbracketed, high * 4, high)
+        npv_high = np.where(unbracketed, npv_and_slope(high)[0], npv_high)
+    # Rows whose flows are all zero have no rate, even though every NPV is 0
+    bracketed = ((np.sign(npv_low) != np.sign(npv_high)) | (npv_low == 0) | (npv_high == 0)) & nonzero.any(axis=-1)
+
+    rate = np.full(batch_shape, 0.1)
+    for _ in range(max_iter):
+        npv, slope = npv_and_slope(rate)
+
+        # Shrink the bracket around the root using the sign at the current rate
+        same_as_low = np.sign(npv) == np.sign(npv_low)
+        low = np.where(same_as_low, rate, low)
+        npv_low = np.where(same_as_low, npv, npv_low)
+        high = np.where(same_as_low, high, rate)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = rate - npv / slope
+        use_newton = np.isfinite(newton) & (newton > low) & (newton < high)
+        next_rate = np.where(use_newton, newton, (low + high) / 2)
+        next_rate = np.where(npv == 0, rate, next_rate)
+
+        converged = np.abs(next_rate - rate) < tol
+        rate = next_rate
+        if np.all(converged | ~bracketed):
+            break
+
+    return np.where(bracketed, rate, np.nan)[()]
+
+
+def monthly_dates(start_date, count):
+    """Dates of `count` consecutive months, starting from start_date's month and day."""
+    start_date = np.datetime64(start_date, 'D')
+    first_of_month = start_date.astype('datetime64[M]')
+    day_offset = start_date - first_of_month.astype('datetime64[D]')
+    month_starts = (first_of_month + np.arange(count)).astype('datetime64[D]')
+    # Keep the day of month, clamped to the month's last day (e.g. 31st -> 30th)
+    month_ends = (first_of_month + np.arange(1, count + 1)).astype('datetime64[D]') - 1
+    return np.minimum(month_starts + day_offset, month_ends)
+
+
+def sip_cash_flows(schedule, start_date):
+    """
+    Dated cash flows of a SIP schedule: each contribution at the start of its month and the
+    final value one month after the last contribution.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Dates and amounts ready for calculate_xirr
+    """
+    if 'contribution' in schedule:
+        contributions = schedule['contribution']
+    else:
+        contributions = np.diff(schedule['invested'], prepend=0.0)
+    months = len(contributions)
+    amounts = np.concatenate([-contributions, [schedule['value'][-1] if months else 0.0]])
+    return monthly_dates(start_date, months + 1), amounts
+
+
+def swp_cash_flows(schedule, initial_investment, start_date, after_tax=True):
+    """
+    Dated cash flows of an SWP schedule: the initial investment, each withdrawal at the start of
+    its month and the remaining balance at the end of the last month.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Dates and amounts ready for calculate_xirr
+    """
+    withdrawals = schedule['after_tax_withdrawal'] if after_tax else schedule['withdrawal']
+    months = len(withdrawals)
+    amounts = np.zeros(months + 1)
+    amounts[0] = -initial_investment
+    amounts[:months] += withdrawals
+    amounts[months] += schedule['balance'][-1] if months else initial_investment
+    return monthly_dates(start_date, months + 1), amounts
+
+
+NAV_DATE_COLUMNS = ['date', 'nav_date', 'trade_date', 'timestamp']
+NAV_VALUE_COLUMNS = ['nav', 'close', 'adj_close', 'value', 'price', 'level']
+
+
+def load_nav_series(path, date_column=None, value_column=None):
+    """
+    Load a daily NAV or index series from a local CSV or Parquet file.
+
+    The first load parses the file and saves a compact binary copy next to it (`<path>.npy`, with a
+    suffix for explicitly chosen columns); later loads memory-map that copy, so multi-decade series
+    are not re-parsed or held in memory twice. The copy is rebuilt whenever the source file is newer,
+    and if it cannot be saved (e.g. a read-only directory) the parsed series is returned from memory.
+
+    Parameters:
+    path (str): Path to a .csv or .parquet file with one row per trading day
+    date_column (str, optional): Name of the date column, detected if omitted
+    value_column (str, optional): Name of the NAV/level column, detected if omitted
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Trading dates (datetime64[D]) and NAVs, sorted by date
+    """
+    cache_path = f"{path}.npy"
+    if date_column or value_column:
+        # Each choice of columns gets its own copy
+        cache_path = f"{path}.{hashlib.sha1(repr((date_column, value_column)).encode()).hexdigest()[:12]}.npy"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        series = np.load(cache_path, mmap_mode='r')
+        return series['date'], series['nav']
+
+    if path.lower().endswith(('.parquet', '.pq')):
+        frame = pd.read_parquet(path, memory_map=True)
+    else:
+        frame = pd.read_csv(path)
+
+    columns = {column.lower().strip(): column for column in frame.columns}
+    date_column = date_column or next((columns[name] for name in NAV_DATE_COLUMNS if name in columns), frame.columns[0])
+    if not value_column:
+        value_column = next((columns[name] for name in NAV_VALUE_COLUMNS if name in columns), None)
+    if not value_column:
+        # Fall back to the first numeric column besides the dates
+        value_column = next(
+            (column for column in frame.columns if column != date_column and pd.api.types.is_numeric_dtype(frame[column])),
+            None
+        )
+    if not value_column:
+        raise ValueError("No NAV column found; name it NAV, close or value, or choose it explicitly")
+
+    series = np.empty(len(frame), dtype=[('date', 'datetime64[D]'), ('nav', 'f8')])
+    series['date'] = pd.to_datetime(frame[date_column]).to_numpy(dtype='datetime64[D]')
+    series['nav'] = pd.to_numeric(frame[value_column], errors='coerce').to_numpy(dtype=float)
+    series = series[np.isfinite(series['nav']) & (series['nav'] > 0)]
+    series.sort(order='date')
+
+    # Write to a temporary file first so an interrupted save never leaves a truncated copy behind
+    temporary_path = f"{cache_path}.tmp"
+    try:
+        with open(temporary_path, 'wb') as cache_file:
+            np.save(cache_file, series)
+        os.replace(temporary_path, cache_path)
+    except OSError as e:
+        print(f"Could not save the NAV cache {cache_path}: {str(e)}")
+        return series['date'], series['nav']
+
+    series = np.load(cache_path, mmap_mode='r')
+    return series['date'], series['nav']
+
+
+def backtest_sip(dates, navs, monthly_contribution, window_years):
+    """
+    Backtest a monthly SIP over every rolling window of the given length in one vectorized pass.
+
+    Contributions buy units on the first trading day of each month. With the running total of
+    1/NAV over those days, the units bought in any window are a difference of two prefix sums,
+    so every start month is evaluated at once. Each window is valued on the first trading day
+    after its last contribution, and its XIRR is solved in the same batch.
+
+    Parameters:
+    dates (np.ndarray): Trading dates (datetime64)
+    navs (np.ndarray): NAV or index level for each date
+    monthly_contribution (float): The amount invested each month
+    window_years (int): Length of each SIP window in years
+
+    Returns:
+    Schedule: One row per start month with invested amount, final value, gain and XIRR
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    navs = np.asarray(navs, dtype=float)
+    window = int(window_years * 12)
+
+    # First trading day of every calendar month
+    calendar_months = dates.astype('datetime64[M]')
+    first_days = np.flatnonzero(np.concatenate([[True], calendar_months[1:] != calendar_months[:-1]]))
+    purchase_dates = dates[first_days]
+    purchase_navs = navs[first_days]
+
+    starts = np.arange(max(len(first_days) - window, 0))
+    cumulative_units = np.concatenate([[0.0], np.cumsum(1 / purchase_navs)])
+    units = monthly_contribution * (cumulative_units[starts + window] - cumulative_units[starts])
+    final_value = units * purchase_navs[starts + window]
+    invested = np.full(len(starts), float(monthly_contribution * window))
+
+    # XIRR of every window at once: the contributions on their actual trading days, then the value
+    flow_index = starts[:, None] + np.arange(window + 1)
+    flows = np.full(flow_index.shape, -float(monthly_contribution))
+    flows[:, -1] = final_value
+    xirr = calculate_xirr(purchase_dates[flow_index], flows) * 100
+
+    return Schedule(
+        {
+            'start_date': purchase_dates[starts],
+            'end_date': purchase_dates[starts + window],
+            'invested': invested,
+            'final_value': final_value,
+            'gain': final_value - invested,
+            'xirr': np.atleast_1d(xirr),
+        },
+        labels={
+            'start_date': 'Start Date',
+            'end_date': 'Valuation Date',
+            'invested': 'Invested Amount',
+            'final_value': 'Final Value',
+            'gain': 'Gain',
+            'xirr': 'XIRR (%)',
+        },
+        kinds={'invested': 'currency', 'final_value': 'currency', 'gain': 'currency', 'xirr': 'percent'},
+        meta={'monthly_contribution': monthly_contribution, 'window_years': window_years}
+    )
+
+
+def summarize_backtest(backtest):
+    """
+    Summarize a backtest_sip result as worst, 10th percentile, median, 90th percentile and best windows.
+
+    Returns:
+    pd.DataFrame: One row per statistic with the XIRR, final value and start date
+    """
+    quantiles = [0, 0.1, 0.5, 0.9, 1]
+    returns = backtest['xirr']
+    if len(backtest) == 0:
+        return pd.DataFrame(columns=['Outcome', 'XIRR (%)', 'Final Value', 'Start Date'])
+
+    # Pick the actual window closest to each XIRR quantile so its final value and date are real
+    order = np.argsort(np.nan_to_num(returns, nan=-np.inf))
+    positions = order[np.round(np.array(quantiles) * (len(order) - 1)).astype(int)]
+    return pd.DataFrame({
+        'Outcome': ['Worst', '10th Percentile', 'Median', '90th Percentile', 'Best'],
+        'XIRR (%)': returns[positions],
+        'Final Value': backtest['final_value'][positions],
+        'Start Date': backtest['start_date'][positions],
+    })
+
+
+def convert_sip_schedule_to_excel(schedule):
+    """
+    Create the detailed SIP analysis workbook for a schedule from calculate_sip_schedule.
+
+    Year-start rows are highlighted green and the break-even row gold, followed by a short
+    break-even summary under the table.
+
+    Parameters:
+    schedule (Schedule): SIP schedule
+
+    Returns:
+    bytes: Excel file content as bytes.
+    """
+    output = BytesIO()
+    breakeven_month = schedule.meta.get('breakeven_month')
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        workbook = writer.book
+        worksheet = workbook.add_worksheet('SIP Details')
         
-        # Deduct the pre-tax withdrawal from the current balance
-        current_balance -= monthly_withdrawal
+        # Format definitions
+        header_format = workbook.add_format({
+            'bold': True,
+            'bg_color': '#F0F2F6',
+            'border': 1
+        })
         
-        # Compound the remaining balance (1% monthly growth)
-        current_balance *= (1 + 0.01)
+        money_format = workbook.add_format({
+            'num_format': '₹#,##0.00',
+            'border': 1
+        })
         
-        # Store the results
-        monthly_balances.append(current_balance)
-        total_withdrawal_history.append(monthly_withdrawal)  # Store pre-tax withdrawal
-        after_tax_withdrawal_history.append(after_tax_withdrawal)  # Store after-tax withdrawal
-    
-    total_withdrawals = sum(total_withdrawal_history)  # Total pre-tax withdrawals
-    after_tax_withdrawals = sum(after_tax_withdrawal_history)  # Total after-tax withdrawals
-    remaining_balance = current_balance
-    
-    return total_withdrawals, after_tax_withdrawals, remaining_balance, monthly_balances, after_tax_withdrawal_history
+        percent_format = workbook.add_format({
+            'num_format': '0.00"%"',
+            'border': 1
+        })
+        
+        border_format = workbook.add_format({
+            'border': 1
+        })
+        
+        year_format = workbook.add_format({
+            'bg_color': '#90EE90',
+        })
+        
+        breakeven_format = workbook.add_format({
+            'bg_color': '#FFD700',
+            'bold': True,
+        })
+        
+        last_row = schedule.write_xlsx(
+            worksheet,
+            header_format=header_format,
+            column_formats={'month': border_format, 'year': border_format, 'currency': money_format, 'percent': percent_format}
+        )
+
+        # Highlight year changes and the breakeven row without rewriting each cell
+        last_col = len(schedule.columns) - 1
+        if len(schedule):
+            if breakeven_month:
+                worksheet.conditional_format(breakeven_month, 0, breakeven_month, last_col, {
+                    'type': 'no_blanks',
+                    'format': breakeven_format
+                })
+            worksheet.conditional_format(1, 0, last_row - 1, last_col, {
+                'type': 'formula',
+                'criteria': '=MOD($A2,12)=1',
+                'format': year_format
+            })
+        
+        # Add breakeven information if applicable
+        summary_row = last_row + 1
+        if breakeven_month:
+            worksheet.write(summary_row, 0, "Breakeven Analysis", workbook.add_format({'bold': True}))
+            worksheet.write(summary_row + 1, 0, f"Initial Breakeven Month: {breakeven_month}")
+            worksheet.write(summary_row + 1, 1, f"Year {(breakeven_month-1)//12 + 1}, Month {(breakeven_month-1)%12 + 1}")
+            worksheet.write(summary_row + 2, 0, "Returns at Breakeven")
+            worksheet.write(summary_row + 2, 1, schedule['returns'][breakeven_month-1], money_format)
+        
+    return output.getvalue()
+
 
 def convert_df_to_excel(df):
             buffer = io.BytesIO()
@@ -345,15 +1759,233 @@ def convert_df_to_excel(df):
                 
                 # Set column widths
                 worksheet.set_column('A:A', 10)  # Month column
-                worksheet.set_column('B:E', 20)  # Other columns
+                worksheet.set_column(1, len(df.columns) - 1, 20)  # Other columns
                 
-                # Apply currency format to relevant columns
-                for row in range(1, len(df) + 1):
-                    worksheet.write_number(row, 1, df.iloc[row-1]['Withdrawal (before tax)'], currency_format)
-                    worksheet.write_number(row, 2, df.iloc[row-1]['Withdrawal (after tax)'], currency_format)
-                    worksheet.write_number(row, 3, df.iloc[row-1]['Tax Paid'], currency_format)
-                    worksheet.write_number(row, 4, df.iloc[row-1]['Remaining Balance'], currency_format)
+                # Apply currency format to every amount column, one column at a time
+                for col_num, column in enumerate(df.columns):
+                    if column != 'Month':
+                        worksheet.write_column(1, col_num, df[column].tolist(), currency_format)
             
             buffer.seek(0)
             return buffer
 
+
+# Flow columns are totalled per year in report bundles; every other column keeps its year-end value
+REPORT_YEARLY_TOTAL_COLUMNS = ['contribution', 'withdrawal', 'after_tax_withdrawal', 'tax_paid',
+                               'cost_basis', 'short_term_gain', 'long_term_gain']
+REPORT_YEARLY_LABELS = {'year': 'Year', 'contribution': 'Contributions in Year'}
+REPORT_BUNDLE_CACHE_SIZE = 32
+
+_report_executor = None
+_report_bundles = OrderedDict()
+_report_bundles_lock = threading.Lock()
+
+
+def _get_report_executor():
+    global _report_executor
+    if _report_executor is None:
+        _report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-bundle')
+    return _report_executor
+
+
+def summarize_schedule_by_year(schedule):
+    """
+    Roll a monthly schedule up to one row per year.
+
+    Parameters:
+    schedule (Schedule): Monthly schedule with a 'month' column
+
+    Returns:
+    Schedule: Year number, yearly totals of the flow columns and year-end values of the others
+    """
+    months = schedule['month']
+    years = (months - 1) // 12 + 1
+    starts = np.flatnonzero(np.concatenate([[True], years[1:] != years[:-1]])) if len(months) else np.zeros(0, dtype=int)
+    ends = np.concatenate([starts[1:], [len(months)]]) - 1 if len(months) else starts
+
+    columns = {'year': years[starts]}
+    for name, values in schedule.columns.items():
+        if name in ('month', 'year'):
+            continue
+        if name in REPORT_YEARLY_TOTAL_COLUMNS:
+            columns[name] = np.add.reduceat(values, starts) if len(starts) else values[:0]
+        else:
+            columns[name] = values[ends]
+    return Schedule(columns, {**schedule.labels, **REPORT_YEARLY_LABELS}, schedule.kinds, schedule.meta)
+
+
+def report_bundle_key(schedules, summary):
+    """
+    Hash the contents of a report bundle, so equal inputs share one cached bundle.
+
+    Parameters:
+    schedules (dict): Schedule name mapped to its monthly Schedule
+    summary (dict): Summary label mapped to its value
+
+    Returns:
+    str: Hex digest identifying the bundle
+    """
+    digest = hashlib.sha256()
+    for name, schedule in schedules.items():
+        digest.update(name.encode())
+        for column, values in schedule.columns.items():
+            digest.update(f"{column}:{values.dtype}:{values.shape}".encode())
+            digest.update(repr(values.tolist()).encode() if values.dtype == object else np.ascontiguousarray(values).tobytes())
+    digest.update(repr(list(summary.items())).encode())
+    return digest.hexdigest()
+
+
+def build_report_bundle(schedules, summary, progress=None):
+    """
+    Build a zip with a multi-sheet workbook and Parquet and CSV copies of each schedule.
+
+    The workbook has a Summary sheet, a monthly and a yearly sheet per schedule and a Charts sheet
+    with native Excel line charts of the balance columns. The Parquet and CSV files use the column
+    names rather than the display headers, for loading into other tools.
+
+    Parameters:
+    schedules (dict): Schedule name (e.g. 'sip') mapped to its monthly Schedule
+    summary (dict): Summary label mapped to its value
+    progress (callable, optional): Called with the fraction done and a status message
+
+    Returns:
+    bytes: Zip file content as bytes.
+    """
+    yearly = {name: summarize_schedule_by_year(schedule) for name, schedule in schedules.items()}
+    steps = 2 + 3 * len(schedules)
+    done = 0
+
+    def report(status):
+        if progress is not None:
+            progress(done / steps, status)
+
+    output = BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        report("Writing the workbook")
+        excel_buffer = BytesIO()
+        with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
+            workbook = writer.book
+            header_format = workbook.add_format({'bold': True, 'bg_color': '#F0F2F6', 'border': 1})
+            column_formats = {
+                'currency': workbook.add_format({'num_format': '₹#,##0.00'}),
+                'percent': workbook.add_format({'num_format': '0.00"%"'}),
+            }
+
+            worksheet = workbook.add_worksheet('Summary')
+            worksheet.write_row(0, 0, ['Parameter', 'Value'], header_format)
+            worksheet.write_column(1, 0, list(summary))
+            worksheet.write_column(1, 1, list(summary.values()))
+            worksheet.set_column(0, 1, 28)
+
+            charts_sheet = workbook.add_worksheet('Charts')
+            for index, (name, schedule) in enumerate(schedules.items()):
+                title = name.upper()
+                for sheet_name, sheet_schedule in ((f"{title} Monthly", schedule), (f"{title} Yearly", yearly[name])):
+                    worksheet = workbook.add_worksheet(sheet_name)
+                    sheet_schedule.write_xlsx(worksheet, header_format=header_format, column_formats=column_formats)
+                    worksheet.set_column(0, len(sheet_schedule.columns) - 1, 18)
+                done += 1
+                report(f"Wrote the {title} sheets")
+
+                # Balance-like currency columns against the month, read from the monthly sheet
+                names = list(schedule.columns)
+                chart = workbook.add_chart({'type': 'line'})
+                for name_index, column in enumerate(names):
+                    if schedule.kinds.get(column) == 'currency' and column not in REPORT_YEARLY_TOTAL_COLUMNS:
+                        chart.add_series({
+                            'name': schedule.label(column),
+                            'categories': [f"{title} Monthly", 1, 0, len(schedule), 0],
+                            'values': [f"{title} Monthly", 1, name_index, len(schedule), name_index],
+                        })
+                chart.set_title({'name': f"{title} Balance Over Time"})
+                chart.set_x_axis({'name': 'Month'})
+                chart.set_y_axis({'name': 'Amount (₹)'})
+                chart.set_size({'width': 720, 'height': 360})
+                charts_sheet.insert_chart(index * 20, 0, chart)
+        bundle.writestr('report.xlsx', excel_buffer.getvalue())
+        done += 1
+
+        report("Writing Parquet files")
+        for name, schedule in schedules.items():
+            for suffix, table in (('monthly', schedule), ('yearly', yearly[name])):
+                frame = pd.DataFrame(table.columns, copy=False)
+                bundle.writestr(f"{name}_{suffix}.parquet", frame.to_parquet(index=False))
+            done += 1
+            report(f"Wrote the {name.upper()} Parquet files")
+
+        report("Writing CSV files")
+        bundle.writestr('summary.csv', pd.DataFrame({'Parameter': list(summary), 'Value': list(summary.values())}).to_csv(index=False))
+        for name, schedule in schedules.items():
+            for suffix, table in (('monthly', schedule), ('yearly', yearly[name])):
+                bundle.writestr(f"{name}_{suffix}.csv", pd.DataFrame(table.columns, copy=False).to_csv(index=False))
+            done += 1
+            report(f"Wrote the {name.upper()} CSV files")
+        done += 1
+    report("Ready")
+    return output.getvalue()
+
+
+class ReportBundleJob:
+    """
+    A report bundle being built on the background worker.
+
+    `progress` (0 to 1) and `status` describe how far it has got and `ready` becomes true once it
+    has finished; `data` then holds the zip content, or stays None if building failed.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.progress = 0.0
+        self.status = "Queued"
+        self.data = None
+        self._done = threading.Event()
+
+    def _run(self, schedules, summary):
+        try:
+            self.data = build_report_bundle(schedules, summary, progress=self._set_progress)
+        except Exception as e:
+            print(f"Error building report bundle: {str(e)}")
+            self.status = f"Failed: {str(e)}"
+        finally:
+            self._done.set()
+
+    def _set_progress(self, progress, status):
+        self.progress = progress
+        self.status = status
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.data
+
+
+def submit_report_bundle(schedules, summary):
+    """
+    Queue a report bundle on the background worker, or return the cached job for the same inputs.
+
+    Parameters:
+    schedules (dict): Schedule name mapped to its monthly Schedule
+    summary (dict): Summary label mapped to its value
+
+    Returns:
+    ReportBundleJob: The queued, running or finished job
+    """
+    key = report_bundle_key(schedules, summary)
+    with _report_bundles_lock:
+        job = _report_bundles.get(key)
+        if job is not None and not (job.ready and job.data is None):
+            _report_bundles.move_to_end(key)
+            return job
+
+        job = ReportBundleJob(key)
+        _report_bundles[key] = job
+        # Drop the least recently requested finished bundles beyond the cache size
+        for old_key in [old_key for old_key, old_job in _report_bundles.items() if old_job.ready]:
+            if len(_report_bundles) <= REPORT_BUNDLE_CACHE_SIZE:
+                break
+            del _report_bundles[old_key]
+    _get_report_executor().submit(job._run, schedules, summary)
+    return job